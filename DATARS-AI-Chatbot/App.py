@@ -4,7 +4,9 @@
 
 import streamlit as st
 from streamlit_extras.buy_me_a_coffee import button
-from utils.functions import is_ollama_running, start_ollama
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.functions import is_ollama_running, start_ollama, get_monitor, load_dataset, finish_ingest, get_queue_stats, debug_panel
+from utils.ollama_client import request_context
 
 # ------------------------------- Configuration ------------------------------ #
 version: str = "0.0.1"
@@ -21,9 +23,16 @@ if "status" not in st.session_state:
     st.session_state["status"] = "Offline"
 
 if not is_ollama_running():
-    start_ollama()
+    error = start_ollama()
     if st.session_state["status"] == "Online":
         st.sidebar.success("ollama is running")
+    else:
+        st.sidebar.warning(error)
+if get_monitor().missing:
+    st.sidebar.warning(
+        "Missing models, run: "
+        + ", ".join(f"`ollama pull {model}`" for model in get_monitor().missing)
+    )
 
 # ---------------------------------------------------------------------------- #
 
@@ -31,15 +40,38 @@ if "df" not in st.session_state:
     st.session_state["df"] = None
 if "file_name" not in st.session_state:
     st.session_state["file_name"] = None
+if "fingerprint" not in st.session_state:
+    st.session_state["fingerprint"] = None
+if "ingest" not in st.session_state:
+    st.session_state["ingest"] = None
     
 with st.sidebar:
-    file = st.file_uploader("Upload data", ["csv"])
+    file = st.file_uploader(
+        "Upload data", ["csv", "gz", "zst", "parquet", "feather", "arrow"]
+    )
 
     if file is not None:
-        st.session_state["file_name"] = file.name
-        import pandas as pd
+        load_dataset(file)
 
-        st.session_state["df"] = pd.read_csv(file)
+
+@st.fragment(run_every=1)
+def ingest_progress() -> None:
+    """
+    Shows the background parse progress and reruns the app once it is done.
+    """
+    job = st.session_state["ingest"]
+    # None once another file was uploaded meanwhile
+    if job is None or job.done.is_set():
+        st.rerun()
+    st.progress(job.progress, text=f"Reading {st.session_state['file_name']}...")
+
+
+if st.session_state["ingest"] is not None:
+    if st.session_state["ingest"].done.is_set():
+        finish_ingest()
+    else:
+        with st.sidebar:
+            ingest_progress()
 
 # ---------------------------------------------------------------------------- #
 
@@ -63,7 +95,19 @@ with st.sidebar:
     st.markdown(8 * "<br>", unsafe_allow_html=True)
     st.caption("Support me by clicking on this button 👇")
     button(username=coffee_username, floating=False, width=221)
+    queue = get_queue_stats()
+    if queue is not None:
+        st.caption(
+            f"Ollama queue: {queue['waiting']} waiting, {queue['active']}/{queue['slots']} running, "
+            f"{queue['loaded_model']} loaded, longest wait {queue['longest_wait']:.0f}s"
+        )
     st.caption(version)
-
-pg.run()
+    # Timings and metrics, opened with ?debug=1 in the URL
+    if st.query_params.get("debug") == "1":
+        with st.expander("Debug"):
+            debug_panel()
+
+# Every model request of this session is interactive and shares the server fairly
+with request_context(priority="interactive", session=get_script_run_ctx().session_id):
+    pg.run()
 # ------------------------------------ End ----------------------------------- #
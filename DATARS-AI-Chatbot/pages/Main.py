@@ -3,7 +3,16 @@
 # ---------------------------------------------------------------------------- #
 import streamlit as st
 import random as rd
-from utils.functions import get_ollama_stream, get_context, get_questions, execute
+from utils.functions import (
+    get_ollama_stream,
+    get_context,
+    request_questions,
+    execute,
+    find_similar_answer,
+    forget_answer,
+    remember_answer,
+)
+from utils.cache import replay_stream
 
 # ---------------------------------------------------------------------------- #
 #                                    Status                                    #
@@ -15,21 +24,51 @@ if st.session_state["df"] is not None:
             st.write("Ollama is running")
 
         if st.session_state["context"] is None:
-            st.session_state["context"] = get_context()
+            st.session_state["context"] = get_context(
+                st.session_state["fingerprint"],
+                st.session_state["file_name"],
+                st.session_state["df"],
+            )
             st.write("Context loaded")
 
+        # Suggestions are generated in the background so they don't hold up the page.
         if st.session_state["questions"] is None:
-            st.session_state["questions"] = get_questions()
-            st.write("Questions loaded")
+            questions = request_questions(
+                st.session_state["fingerprint"], st.session_state["context"]
+            )
+            st.write("Generating question suggestions")
         status.update(label="Loading complete!", state="complete", expanded=False)
-        
+
+    @st.fragment(run_every=2)
+    def wait_for_questions() -> None:
+        """
+        Polls the background question job and reruns the page once it is done.
+        """
+        if questions.done():
+            if questions.exception() is not None:
+                # Stop polling; an empty list shows no buttons
+                st.session_state["questions"] = []
+                st.session_state["questions_failed"] = st.session_state["fingerprint"]
+                st.rerun()
+            # The result is shared with other sessions, copy it before shuffling.
+            st.session_state["questions"] = list(questions.result() or [])
+            st.rerun()
+        st.caption("Thinking of some questions to ask...")
+
 
     # ------------------------- Render suggestion buttons ------------------------ #
     def render_buttons() -> None:
         """
         Function to render the three question buttons abover the chat input
         """
-        
+        if st.session_state["questions"] is None:
+            wait_for_questions()
+            return None
+        if st.session_state.get("questions_failed") == st.session_state["fingerprint"]:
+            st.caption("Could not generate question suggestions.")
+        if len(st.session_state["questions"]) < 3:
+            return None
+
         q1, q2, q3 = st.session_state["questions"][:3]
 
         left, mid, right = st.columns([1, 1, 1])
@@ -51,6 +90,9 @@ if st.session_state["df"] is not None:
         st.session_state.messages = []
     if "user_input" not in st.session_state:
         st.session_state.user_input = None
+    # While the upload is still parsed in the background only a sample is loaded,
+    # so code is not executed until the full data is there.
+    loading = st.session_state["ingest"] is not None
     # Display the existing chat messages via `st.chat_message`.
     for message in st.session_state.messages:
         if message["role"] == "user":
@@ -58,11 +100,16 @@ if st.session_state["df"] is not None:
                 st.markdown(message["content"])
         if message["role"] == "assistant":
             with st.chat_message("assistant"):
+                if message.get("similar"):
+                    st.caption(f"Reused the answer to: {message['similar']}")
                 with st.expander("Show Code"):
                     st.markdown(message["content"])
                 con = st.container(border=True)
                 with con:
-                    execute(message["content"])
+                    if loading:
+                        st.caption("Waiting for the data to finish loading...")
+                    else:
+                        execute(message["content"])
     st.divider()
     render_buttons()
 
@@ -71,7 +118,9 @@ if st.session_state["df"] is not None:
     # ---------------------------------------------------------------------------- #
     # Create a chat input field to allow the user to enter a message. This will display
     # automatically at the bottom of the page.
-    chat_box_input = st.chat_input("Ask your question")
+    chat_box_input = st.chat_input(
+        "Loading the data..." if loading else "Ask your question", disabled=loading
+    )
 
     def enter(prompt):
         if isinstance(prompt, str):
@@ -79,27 +128,49 @@ if st.session_state["df"] is not None:
                 st.markdown(prompt)
             st.session_state.messages.append({"role": "user", "content": prompt})
 
-            stream = get_ollama_stream(prompt)
+            # The same question asked in other words reuses the earlier code
+            # (after a dry run on this data) instead of calling the model
+            similar, vector = find_similar_answer(prompt)
+            if similar is not None:
+                stream = replay_stream(similar["answer"])
+            else:
+                stream = get_ollama_stream(prompt)
 
             # Stream the response to the chat using `st.write_stream`, then store it in
             # session state.
             with st.chat_message("assistant"):
+                if similar is not None:
+                    st.caption(f"Reused the answer to: {similar['question']}")
                 response = st.write_stream(stream)
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.messages.append(
+                {
+                    "role": "assistant",
+                    "content": response,
+                    "similar": similar["question"] if similar is not None else None,
+                }
+            )
 
             con = st.container(border=True)
             with con:
-                execute(response)
+                error, code = execute(response)
+            if error is None and similar is None and vector is not None:
+                remember_answer(prompt, vector, response, code)
+            elif error is not None and similar is None:
+                forget_answer()
             st.session_state.user_input = None
-            rd.shuffle(st.session_state.questions)
+            # Suggestions may still be loading (None)
+            if isinstance(st.session_state.questions, list):
+                rd.shuffle(st.session_state.questions)
             st.rerun()
 
     if chat_box_input is not None:
         st.session_state.user_input = chat_box_input
 
-    enter(st.session_state.user_input)
-    
-    st.session_state.user_input = None
+    # A suggestion clicked while loading stays queued until the data is ready.
+    if not loading:
+        enter(st.session_state.user_input)
+
+        st.session_state.user_input = None
     
 
 else:
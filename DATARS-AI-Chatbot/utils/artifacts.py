@@ -0,0 +1,262 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import ast
+import builtins
+import io
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import pandas as pd
+
+# ------------------------------- Configuration ------------------------------ #
+max_bytes: int = 256 * 1024 * 1024
+
+# Streamlit calls whose arguments fully describe their output, so they can be
+# recorded once and replayed later without running the generated code again.
+REPLAYABLE: set[str] = {
+    "write",
+    "markdown",
+    "text",
+    "code",
+    "latex",
+    "json",
+    "title",
+    "header",
+    "subheader",
+    "caption",
+    "divider",
+    "metric",
+    "dataframe",
+    "table",
+    "plotly_chart",
+    "bar_chart",
+    "line_chart",
+    "area_chart",
+    "scatter_chart",
+    "map",
+    "info",
+    "success",
+    "warning",
+    "error",
+    "exception",
+}
+
+
+# ---------------------------------------------------------------------------- #
+#                            S E R I A L I Z A T I O N                         #
+# ---------------------------------------------------------------------------- #
+
+
+def serialize_value(value: Any) -> tuple[str, Any]:
+    """
+    Turns a streamlit argument into a compact, storable artifact.
+
+    Plotly figures are stored as their JSON, DataFrames / Series as Parquet bytes.
+    Anything else (or anything Parquet refuses, e.g. non string column names)
+    is kept as the original object.
+
+    Args:
+        value (Any): An argument passed to a streamlit call.
+
+    Returns:
+        tuple[str, Any]: A (kind, payload) pair understood by `deserialize_value`.
+    """
+    if type(value).__module__.startswith("plotly") and hasattr(value, "to_json"):
+        return "plotly", value.to_json()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        kind = "parquet" if isinstance(value, pd.DataFrame) else "parquet_series"
+        frame = value if isinstance(value, pd.DataFrame) else value.to_frame()
+        try:
+            buffer = io.BytesIO()
+            frame.to_parquet(buffer)
+            return kind, buffer.getvalue()
+        except Exception:
+            return "raw", value
+    return "raw", value
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def deserialize_value(kind: str, payload: Any) -> Any:
+    """
+    Inverse of `serialize_value`.
+    """
+    if kind == "plotly":
+        import plotly.io as pio
+
+        return pio.from_json(payload)
+    if kind in ("parquet", "parquet_series"):
+        frame = pd.read_parquet(io.BytesIO(payload))
+        return frame.iloc[:, 0] if kind == "parquet_series" else frame
+    return payload
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def artifact_size(kind: str, payload: Any) -> int:
+    """Rough number of bytes an artifact keeps alive."""
+    if isinstance(payload, (bytes, str)):
+        return len(payload)
+    if isinstance(payload, (pd.DataFrame, pd.Series)):
+        return int(payload.memory_usage(deep=True).sum())
+    return sys.getsizeof(payload)
+
+
+# ---------------------------------------------------------------------------- #
+#                                R E C O R D E R                               #
+# ---------------------------------------------------------------------------- #
+
+
+class UnsupportedElement(AttributeError):
+    """Raised by a target-less `Recorder` for streamlit calls it can't record."""
+
+
+class Recorder:
+    """
+    Stand-in for the `st` module while generated code runs.
+
+    Replayable calls are serialized into `elements` and forwarded to `target`
+    (the real streamlit module, or None to only record). Any other streamlit
+    attribute (layouts, widgets, ...) is passed straight through and marks the
+    run as not replayable.
+    """
+
+    def __init__(self, target: Any = None) -> None:
+        self.target = target
+        self.elements: list[tuple[str, list, dict]] = []
+        self.replayable = True
+
+    def record(self, name: str, *args, **kwargs) -> None:
+        """Serializes one streamlit call."""
+        self.elements.append(
+            (
+                name,
+                [serialize_value(arg) for arg in args],
+                {key: serialize_value(value) for key, value in kwargs.items()},
+            )
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in REPLAYABLE:
+            if self.target is None:
+                raise UnsupportedElement(f"st.{name} can not be recorded")
+            self.replayable = False
+            return getattr(self.target, name)
+
+        def call(*args, **kwargs):
+            self.record(name, *args, **kwargs)
+            if self.target is not None:
+                return getattr(self.target, name)(*args, **kwargs)
+
+        return call
+
+    def builtins(self) -> dict:
+        """
+        Builtins for `exec` where `import streamlit as st` yields this recorder,
+        since generated code usually re-imports streamlit itself.
+        """
+
+        def _import(name, *args, **kwargs):
+            if name == "streamlit":
+                return self
+            return builtins.__import__(name, *args, **kwargs)
+
+        namespace = dict(vars(builtins))
+        namespace["__import__"] = _import
+        return namespace
+
+
+def uses_unreplayable(code: str) -> bool:
+    """
+    True if `code` calls a streamlit attribute that can't be recorded (layouts,
+    widgets, ...), so it has to run on the page instead of in a worker.
+    Dynamic uses (getattr, passing `st` around) are only found when they run.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    names = {"st"}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names |= {a.asname or a.name for a in node.names if a.name == "streamlit"}
+        elif isinstance(node, ast.ImportFrom) and node.module == "streamlit":
+            if any(alias.name not in REPLAYABLE for alias in node.names):
+                return True
+    return any(
+        isinstance(node, ast.Attribute)
+        and isinstance(node.value, ast.Name)
+        and node.value.id in names
+        and node.attr not in REPLAYABLE
+        for node in ast.walk(tree)
+    )
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def replay(elements: list[tuple[str, list, dict]], target: Any) -> None:
+    """
+    Renders recorded elements again.
+
+    Args:
+        elements (list): Elements recorded by a `Recorder`.
+        target (Any): The streamlit module (or a container) to render into.
+    """
+    for name, args, kwargs in elements:
+        getattr(target, name)(
+            *[deserialize_value(*arg) for arg in args],
+            **{key: deserialize_value(*value) for key, value in kwargs.items()},
+        )
+
+
+# ---------------------------------------------------------------------------- #
+#                                   S T O R E                                  #
+# ---------------------------------------------------------------------------- #
+
+
+class ArtifactStore:
+    """
+    Bounded in-memory LRU of recorded outputs, keyed by code hash and dataset
+    fingerprint. Least recently used results are dropped past `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = max_bytes) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: OrderedDict[str, tuple[list, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> list | None:
+        """Returns the recorded elements for `key`, or None."""
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key: str, elements: list) -> None:
+        """Stores recorded elements under `key` and evicts past `max_bytes`."""
+        size = sum(
+            artifact_size(*value)
+            for _, args, kwargs in elements
+            for value in [*args, *kwargs.values()]
+        )
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+            self._items[key] = (elements, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= evicted
+
+
+# ------------------------------------ End ----------------------------------- #
@@ -0,0 +1,195 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Generator, Iterable
+
+# ------------------------------- Configuration ------------------------------ #
+CACHE_DIR: str = os.environ.get(
+    "DATARS_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", ".cache")
+)
+max_entries: int = 2000
+ttl_seconds: int = 7 * 24 * 60 * 60
+
+
+# ---------------------------------------------------------------------------- #
+#                              R E S P O N S E S                               #
+# ---------------------------------------------------------------------------- #
+
+
+def make_key(*parts: str) -> str:
+    """
+    Builds a stable cache key out of any number of string parts.
+
+    Args:
+        *parts (str): Pieces that identify a request, e.g. model, prompt and schema hash.
+
+    Returns:
+        str: The sha256 hex digest of the parts.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def replay_stream(text: str) -> Generator[str, None, None]:
+    """
+    Replays a cached answer as a fake token stream so `st.write_stream` still works.
+
+    Args:
+        text (str): The full cached response.
+
+    Yields:
+        str: Word sized pieces of the response, whitespace included.
+    """
+    for piece in re.findall(r"\S+\s*|\s+", text):
+        yield piece
+
+
+# ---------------------------------------------------------------------------- #
+
+
+class ResponseCache:
+    """
+    Disk backed (SQLite) cache of LLM responses with TTL and size based eviction.
+
+    Entries are evicted once they are older than `ttl` seconds, and the least
+    recently used entries are dropped when there are more than `max_entries`.
+    Hit and miss counters are kept per process.
+    """
+
+    def __init__(
+        self, path: str, max_entries: int = max_entries, ttl: int = ttl_seconds
+    ) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached response for `key`, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """Stores `response` under `key` and evicts expired / excess entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (now - self.ttl,)
+            )
+            self._conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def cached_stream(
+        self, key: str, stream: Iterable[str]
+    ) -> Generator[str, None, None]:
+        """
+        Passes `stream` through while recording it, and stores the full text once
+        the stream is exhausted. Partial streams (errors, stop button) are not stored.
+        """
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        self.set(key, "".join(chunks))
+
+    def delete(self, key: str) -> None:
+        """Drops the response stored under `key`, e.g. an answer whose code failed."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Returns the hit / miss counters and the number of stored entries."""
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
+
+    def clear(self) -> None:
+        """Drops every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+# ---------------------------------------------------------------------------- #
+
+
+class BackgroundCache:
+    """
+    Runs `function` at most once per key on a small thread pool and keeps the
+    futures of the last `max_entries` keys, shared by every session.
+    Failed jobs are dropped so the next request retries them.
+    """
+
+    def __init__(
+        self, function: Callable, max_entries: int = 32, workers: int = 2
+    ) -> None:
+        self.function = function
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._futures: OrderedDict[str, Future] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, *args, **kwargs) -> Future:
+        """Returns the (possibly still running) job for `key`, starting it if needed."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not (future.done() and future.exception()):
+                self._futures.move_to_end(key)
+                return future
+            future = self._executor.submit(self.function, *args, **kwargs)
+            self._futures[key] = future
+            while len(self._futures) > self.max_entries:
+                self._futures.popitem(last=False)
+            return future
+
+
+# ------------------------------------ End ----------------------------------- #
@@ -0,0 +1,435 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from types import CodeType
+from typing import BinaryIO, Callable
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from utils.cache import CACHE_DIR
+
+# ------------------------------- Configuration ------------------------------ #
+DATA_DIR: str = os.path.join(CACHE_DIR, "datasets")
+max_bytes: int = 8 * 1024 * 1024 * 1024
+
+# Uploads in these formats are kept as they are and only read on demand.
+LAZY_FORMATS: dict[str, str] = {
+    "parquet": "parquet",
+    "feather": "feather",
+    "arrow": "feather",
+}
+# Compressed CSV extensions and their `pd.read_csv` compression.
+CSV_COMPRESSION: dict[str, str] = {"gz": "gzip", "zst": "zstd"}
+
+
+# ---------------------------------------------------------------------------- #
+#                                  S T O R A G E                               #
+# ---------------------------------------------------------------------------- #
+
+
+def content_hash(file: BinaryIO, block_size: int = 1 << 20) -> str:
+    """
+    Hashes an uploaded file's bytes without copying it.
+
+    Args:
+        file (BinaryIO): The uploaded file (any seekable binary file object).
+        block_size (int, optional): Bytes hashed per step. Defaults to 1 MiB.
+
+    Returns:
+        str: The sha256 hex digest of the content.
+    """
+    digest = hashlib.sha256()
+    position = file.tell()
+    file.seek(0)
+    for block in iter(lambda: file.read(block_size), b""):
+        digest.update(block)
+    file.seek(position)
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def arrow_path(key: str) -> str:
+    """Where the Arrow copy of a parsed CSV lives on disk."""
+    return os.path.join(DATA_DIR, f"{key}.arrow")
+
+
+def find_path(key: str) -> str | None:
+    """Returns the stored file of a dataset, whatever its format, or None."""
+    for ext in ("arrow", *set(LAZY_FORMATS.values())):
+        path = os.path.join(DATA_DIR, f"{key}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def stored_datasets() -> list[tuple[str, str, int]]:
+    """(key, path, size) of every dataset file in `DATA_DIR`, oldest first."""
+    entries = []
+    if not os.path.isdir(DATA_DIR):
+        return entries
+    for name in os.listdir(DATA_DIR):
+        key, _, ext = name.rpartition(".")
+        if ext != "arrow" and ext not in LAZY_FORMATS.values():
+            continue
+        path = os.path.join(DATA_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, key, path, stat.st_size))
+    return [(key, path, size) for _, key, path, size in sorted(entries)]
+
+
+def _atomic_path(path: str) -> str:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_arrow(df: pd.DataFrame, key: str) -> str:
+    """
+    Writes a DataFrame once as an uncompressed Arrow IPC file, so it can be
+    memory mapped by every session and every sandbox worker.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to store.
+        key (str): Dataset key, used as the file name.
+
+    Returns:
+        str: Path of the Arrow file.
+    """
+    path = arrow_path(key)
+    if not os.path.exists(path):
+        tmp = _atomic_path(path)
+        # One record batch: columns split into chunks are copied when converted
+        feather.write_feather(df, tmp, compression="uncompressed", chunksize=max(len(df), 1))
+        os.replace(tmp, path)
+    return path
+
+
+def save_upload(file: BinaryIO, key: str, ext: str, block_size: int = 1 << 20) -> str:
+    """
+    Copies a Parquet / Feather upload to disk as it is, without parsing it.
+
+    Args:
+        file (BinaryIO): The uploaded file.
+        key (str): Dataset key, used as the file name.
+        ext (str): The upload's extension (a key of `LAZY_FORMATS`).
+
+    Returns:
+        str: Path of the stored file.
+    """
+    path = os.path.join(DATA_DIR, f"{key}.{LAZY_FORMATS[ext]}")
+    if not os.path.exists(path):
+        tmp = _atomic_path(path)
+        file.seek(0)
+        with open(tmp, "wb") as out:
+            for block in iter(lambda: file.read(block_size), b""):
+                out.write(block)
+        os.replace(tmp, path)
+    return path
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def to_frame(table: pa.Table) -> pd.DataFrame:
+    """
+    Converts an Arrow table with the dtypes pandas wrote it with (numpy
+    numbers and dates, `str`, categoricals) instead of pyarrow dtypes.
+
+    With one block per column, numeric and datetime columns without nulls and
+    string columns are views of the Arrow buffers; booleans, nullable integers
+    and categorical codes are copied.
+    """
+    return table.to_pandas(split_blocks=True)
+
+
+def open_arrow(path: str) -> pd.DataFrame:
+    """
+    Opens an Arrow file as a DataFrame over its memory mapped buffers (see
+    `to_frame` for the columns that are copied). Mapped pages live in the OS
+    page cache, so every process mapping the same file shares them.
+    """
+    source = pa.memory_map(path)
+    return to_frame(pa.ipc.open_file(source).read_all())
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    """Materializes a stored dataset of any supported format."""
+    if path.endswith(".parquet"):
+        # Parquet is decoded into new buffers, nothing is shared
+        return to_frame(pq.read_table(path, memory_map=True))
+    return open_arrow(path)
+
+
+def read_schema(path: str) -> tuple[pa.Schema, int]:
+    """
+    Reads only the metadata of a stored dataset.
+
+    Returns:
+        tuple[pa.Schema, int]: The Arrow schema and the number of rows.
+    """
+    if path.endswith(".parquet"):
+        metadata = pq.read_metadata(path)
+        return metadata.schema.to_arrow_schema(), metadata.num_rows
+    reader = pa.ipc.open_file(pa.memory_map(path))
+    rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return reader.schema, rows
+
+
+def schema_frame(path: str) -> pd.DataFrame:
+    """An empty DataFrame with the stored dataset's columns and dtypes."""
+    schema, _ = read_schema(path)
+    return to_frame(schema.empty_table())
+
+
+# ---------------------------------------------------------------------------- #
+#                                   Q U E R Y                                  #
+# ---------------------------------------------------------------------------- #
+
+
+def connect(path: str) -> duckdb.DuckDBPyConnection:
+    """
+    A DuckDB connection with the stored dataset exposed as the view `data`.
+    Queries only read the columns (and Parquet row groups) they touch; Arrow /
+    Feather files are scanned as a dataset, not read into a table first.
+    """
+    con = duckdb.connect()
+    if path.endswith(".parquet"):
+        con.read_parquet(path).create_view("data")
+    else:
+        con.register("data", ds.dataset(path, format="feather"))
+    return con
+
+
+def _names(code: CodeType) -> set[str]:
+    """Global / free names used by compiled code, nested functions included."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _names(const)
+    return names
+
+
+class LazyNamespace(dict):
+    """
+    `exec` globals where `df` is only loaded if the code uses it, and
+    `sql(query)` runs DuckDB SQL against the view `data`.
+    """
+
+    def __init__(self, path: str, loader: Callable[[], pd.DataFrame], **values) -> None:
+        super().__init__(**values)
+        self.path = path
+        self.loader = loader
+        self["sql"] = self.sql
+
+    def sql(self, query: str) -> pd.DataFrame:
+        if "_con" not in self.__dict__:
+            self._con = connect(self.path)
+        return self._con.sql(query).df()
+
+    def run(self, code: str) -> None:
+        """
+        Executes `code` in this namespace. `df` is bound to the real frame up
+        front when any part of the code (functions, lambdas and comprehensions
+        included) names it, so plain dict lookups find it everywhere.
+        """
+        compiled = compile(code, "<string>", "exec")
+        if "df" in _names(compiled):
+            self["df"] = self.loader()
+        exec(compiled, self)
+
+
+# ---------------------------------------------------------------------------- #
+#                                R E G I S T R Y                               #
+# ---------------------------------------------------------------------------- #
+
+
+class Dataset:
+    """
+    One upload, shared by every session that uploaded the same bytes.
+
+    Parsed CSVs live in an Arrow file that is memory mapped right away; Parquet
+    and Feather uploads are `lazy` and only read when a frame is needed.
+    """
+
+    def __init__(self, key: str, name: str, path: str) -> None:
+        self.key = key
+        self.name = name
+        self.path = path
+        self.lazy = not path.endswith(".arrow")
+        self.nbytes = os.path.getsize(path)
+        self.sessions: set[str] = set()
+        self._frame = None if self.lazy else open_arrow(path)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            self._frame = read_frame(self.path)
+        return self._frame
+
+    def view(self) -> pd.DataFrame:
+        """
+        A per-session view of the data. Columns are shared with every other
+        view; assigning new columns only affects this view.
+        """
+        return self.frame.copy(deep=False)
+
+
+# ---------------------------------------------------------------------------- #
+
+
+class DatasetRegistry:
+    """
+    Process wide registry of uploaded datasets keyed by content hash.
+
+    Each CSV upload is parsed once, stored as an Arrow file and memory mapped;
+    sessions get shallow views of one shared frame. Parquet / Feather uploads are stored as they
+    are and read lazily. Sessions holding a dataset are reference
+    counted, and unreferenced datasets are evicted least recently used first
+    once the registry grows past `max_bytes`. Files left in `DATA_DIR` by
+    earlier runs of the server count towards the budget too, and go first.
+    """
+
+    def __init__(self, max_bytes: int = max_bytes) -> None:
+        self.max_bytes = max_bytes
+        self._datasets: OrderedDict[str, Dataset] = OrderedDict()
+        # Stored files not loaded by this process yet: key -> (path, size)
+        self._stored: OrderedDict[str, tuple[str, int]] = OrderedDict(
+            (key, (path, size)) for key, path, size in stored_datasets()
+        )
+        self._loading: dict[str, threading.Lock] = {}
+        self._jobs: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.evict()
+
+    def get(self, key: str) -> Dataset | None:
+        """Returns the dataset stored under `key` if it is loaded (or on disk)."""
+        with self._lock:
+            if key in self._datasets:
+                self._datasets.move_to_end(key)
+                return self._datasets[key]
+        path = find_path(key)
+        if path is not None:
+            return self.get_or_load(key, key, lambda: path)
+        return None
+
+    def ingest(self, key: str, name: str, factory: Callable[[], object]) -> object:
+        """
+        Starts (or joins) a background load of `key`.
+
+        `factory` builds a job such as `utils.ingest.CsvIngest`; the job is started
+        once per key, however many sessions upload the same bytes meanwhile, and
+        its frame is stored in the registry when it finishes successfully.
+        """
+        with self._lock:
+            if key in self._jobs:
+                return self._jobs[key]
+            job = factory()
+            self._jobs[key] = job
+
+        def on_done(job) -> None:
+            if job.error is None:
+                self.get_or_load(key, name, lambda: write_arrow(job.frame, key))
+            with self._lock:
+                self._jobs.pop(key, None)
+
+        job.on_done = on_done
+        job.start()
+        return job
+
+    def get_or_load(
+        self, key: str, name: str, loader: Callable[[], str]
+    ) -> Dataset:
+        """
+        Returns the dataset stored under `key`, calling `loader` (which stores it
+        on disk and returns the path) only if no session, and no earlier run of
+        the server, has done so already. Concurrent callers wait for one load.
+        """
+        with self._lock:
+            if key in self._datasets:
+                self._datasets.move_to_end(key)
+                return self._datasets[key]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                if key in self._datasets:
+                    return self._datasets[key]
+            dataset = Dataset(key, name, find_path(key) or loader())
+            with self._lock:
+                self._datasets[key] = dataset
+                self._stored.pop(key, None)
+                self._loading.pop(key, None)
+            return dataset
+
+    def acquire(self, key: str, session_id: str) -> None:
+        """Marks `key` as used by `session_id`."""
+        with self._lock:
+            self._datasets[key].sessions.add(session_id)
+            self._datasets.move_to_end(key)
+
+    def release(self, key: str, session_id: str) -> None:
+        """Drops the reference `session_id` holds on `key`."""
+        with self._lock:
+            if key in self._datasets:
+                self._datasets[key].sessions.discard(session_id)
+
+    def evict(self, is_active: Callable[[str], bool] = lambda session_id: True) -> None:
+        """
+        Forgets sessions for which `is_active` is False, then evicts
+        unreferenced datasets (stored files not loaded since the server
+        started, then least recently used first) past `max_bytes`.
+        """
+        with self._lock:
+            for dataset in self._datasets.values():
+                dataset.sessions = {s for s in dataset.sessions if is_active(s)}
+            size = sum(dataset.nbytes for dataset in self._datasets.values())
+            size += sum(nbytes for _, nbytes in self._stored.values())
+            for key in list(self._stored):
+                if size <= self.max_bytes:
+                    break
+                if key in self._loading or key in self._jobs:
+                    continue
+                path, nbytes = self._stored.pop(key)
+                size -= nbytes
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            for key in list(self._datasets):
+                if size <= self.max_bytes:
+                    break
+                dataset = self._datasets[key]
+                if dataset.sessions:
+                    continue
+                del self._datasets[key]
+                size -= dataset.nbytes
+                try:
+                    os.remove(dataset.path)
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        """Number of loaded datasets, their total size, open references and stored files."""
+        with self._lock:
+            return {
+                "datasets": len(self._datasets),
+                "bytes": sum(d.nbytes for d in self._datasets.values()),
+                "stored_bytes": sum(nbytes for _, nbytes in self._stored.values()),
+                "references": sum(len(d.sessions) for d in self._datasets.values()),
+            }
+
+
+# ------------------------------------ End ----------------------------------- #
@@ -1,31 +1,73 @@
 # ---------------------------------------------------------------------------- #
 #                                    IMPORTS                                   #
 # ---------------------------------------------------------------------------- #
-import ollama
 import streamlit as st
-import requests
-import subprocess
-import time
 from typing import Generator
 import re
 import ast
+import os
+import numpy as np
+import pandas as pd
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.ollama_client import get_client, request_context
+from utils.health import OllamaMonitor
+from utils.cache import BackgroundCache, ResponseCache, CACHE_DIR, make_key, replay_stream
+from concurrent.futures import Future
+from utils.artifacts import ArtifactStore, Recorder, replay, uses_unreplayable
+from utils.sandbox import WorkerPool, describe_error
+from utils.datasets import (
+    CSV_COMPRESSION,
+    LAZY_FORMATS,
+    Dataset,
+    DatasetRegistry,
+    LazyNamespace,
+    content_hash,
+    save_upload,
+    schema_frame,
+    write_arrow,
+)
+from utils.ingest import CsvIngest
+from utils.profile import format_profile, profile_frame, profile_path
+from utils.metrics import get_metrics, span, timed_stream
+from utils.validate import extract_code, validate_code
+from utils.semantic import EMBED_MODEL, QuestionIndex, schema_fingerprint
+
+# ------------------------------- Configuration ------------------------------ #
+# Failing generated code is sent back to the model for a fix this many times
+max_repairs: int = 2
+repair_tokens: int = 768
+ERROR_PREFIX: str = "An error occurred: "
+REPAIR_PREFIX: str = "The generated code failed, "
+MISSING_DATASET: str = "The dataset is no longer available, please upload the file again."
 
 # ---------------------------------------------------------------------------- #
 #                               F U N C T I O N S                              #
 # ---------------------------------------------------------------------------- #
 
 
+@st.cache_resource
+def get_monitor() -> OllamaMonitor:
+    """
+    Returns the process wide Ollama health monitor.
+    Returns:
+        OllamaMonitor: Background checker with a cached server status.
+    """
+    return OllamaMonitor(get_client())
+
+
+# ---------------------------------------------------------------------------- #
+
+
 def is_ollama_running() -> bool:
     """_summary_
-    Check if ollama is running or not
+    Check if ollama is running or not, from the monitor's cached status.
     Returns:
         bool: True if it is, False in any other case.
     """
-    try:
-        response = requests.get("http://localhost:11434", timeout=2)
-        return response.status_code == 200
-    except requests.exceptions.RequestException:
-        return False
+    running = get_monitor().is_running()
+    st.session_state.status = "Online" if running else "Offline"
+    return running
 
 
 # ---------------------------------------------------------------------------- #
@@ -33,16 +75,13 @@ def is_ollama_running() -> bool:
 
 def start_ollama() -> None | str:
     """_summary_
-    Try to start ollama.
+    Try to start ollama, without waiting for it to answer.
     Returns:
-        None | str: _description_
+        None | str: None if it is running, a message otherwise.
     """
     try:
-        subprocess.Popen(
-            ["ollama", "serve"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        )
-
-        time.sleep(3)
+        if not get_monitor().start_server():
+            return "Starting Ollama, it shows as running once it answers"
         st.session_state.status = "Online"
         return None
     except Exception as e:
@@ -52,6 +91,19 @@ def start_ollama() -> None | str:
 # ---------------------------------------------------------------------------- #
 
 
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """
+    Returns the process wide LLM response cache, shared by every session.
+    Returns:
+        ResponseCache: The SQLite backed cache stored in `CACHE_DIR`.
+    """
+    return ResponseCache(os.path.join(CACHE_DIR, "responses.sqlite"))
+
+
+# ---------------------------------------------------------------------------- #
+
+
 def get_ollama_stream(
     user_prompt: str, model: str = "qwen2.5-coder:7b"
 ) -> Generator[str, None, None]:
@@ -67,6 +119,9 @@ def get_ollama_stream(
     Notes:
         - The function uses the "qwen2.5-coder:7b" model for generating responses.
         - Responses are streamed in chunks, and each chunk's content is yielded.
+        - Answers are cached per model, prompt and dataset schema; a cache hit is
+          replayed as a fake stream instead of calling the model. Call
+          `forget_answer` when the answer's code fails.
     """
 
     prompt = f"""You are a data analyst assistant working on a with the following columns:
@@ -81,8 +136,14 @@ and Categorical columns are:
 columns data types are:
 {st.session_state["context"]["dtypes"]}
 
+column statistics (nulls, distinct values, ranges, frequent values) and sample rows:
+{st.session_state["context"]["profile"]}
+
 
 The data frame is loaded in the variable df.
+The same data is also available as the table data through sql(query), which runs
+a DuckDB SQL query and returns a pandas DataFrame; prefer it for aggregations
+and filters on large data since it only reads the columns it needs.
 You will be provided a question related to the data frame.
 Your task is to answer the question using Python code.
 First decide whether the question requires a plot or not.
@@ -93,10 +154,32 @@ Respond only with executable Python code blocks that can run inside exec().
 Question:
 {user_prompt}"""
 
-    for chunk in ollama.chat(
-        model=model, messages=[{"role": "user", "content": prompt}], stream=True
-    ):
-        yield chunk["message"]["content"]
+    cache = get_response_cache()
+    key = make_key(model, prompt, str(st.session_state["context"]))
+    # Lets `forget_answer` drop it if its code fails
+    st.session_state["response_key"] = key
+    cached = cache.get(key)
+    if cached is not None:
+        yield from timed_stream(replay_stream(cached), "llm_stream", model=model, cache="hit")
+        return
+
+    stream = (
+        chunk["message"]["content"]
+        for chunk in get_client().chat_stream(
+            model, [{"role": "user", "content": prompt}]
+        )
+    )
+    yield from timed_stream(cache.cached_stream(key, stream), "llm_stream", model=model, cache="miss")
+
+
+def forget_answer() -> None:
+    """
+    Drops the last answer of `get_ollama_stream` from the response cache, so
+    asking again calls the model instead of replaying code that failed.
+    """
+    key = st.session_state.pop("response_key", None)
+    if key is not None:
+        get_response_cache().delete(key)
 
 
 # ---------------------------------------------------------------------------- #
@@ -113,20 +196,56 @@ def callOllama(prompt: str, model: str = "gemma3") -> str:
                 If no response is received, returns "No response.".
     """
 
-    response = ollama.chat(model=model, messages=[{"role": "user", "content": prompt}])
-    return response.get("message", {}).get("content", "No response.")
+    cache = get_response_cache()
+    key = make_key(model, prompt)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    response = get_client().chat(model, [{"role": "user", "content": prompt}])
+    content = response.get("message", {}).get("content")
+    if content is None:
+        return "No response."
+    cache.set(key, content)
+    return content
+
+
+# ---------------------------------------------------------------------------- #
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_profile(fingerprint: str, _df: pd.DataFrame, path: str | None = None) -> dict:
+    """
+    Profiles a dataset once per fingerprint (see `utils.profile`).
+    While a CSV is still loading, the fingerprint ends in ":sample" and only the
+    sample is profiled; the full data is profiled once it is available.
+    Args:
+        fingerprint (str): Dataset fingerprint, the cache key.
+        _df (pd.DataFrame): The data to profile (not hashed by streamlit).
+        path (str | None, optional): File of a lazy dataset, profiled with DuckDB
+            instead of `_df`. Defaults to None.
+    Returns:
+        dict: The dataset profile.
+    """
+    if path is not None:
+        return profile_path(path)
+    return profile_frame(_df)
 
 
 # ---------------------------------------------------------------------------- #
 
 
-@st.cache_data
-def get_context() -> dict:
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_context(fingerprint: str, file_name: str, _df: pd.DataFrame) -> dict:
     """
-    Retrieve and cache the context information of a DataFrame stored in the session state.
+    Retrieve and cache the context information of a DataFrame.
     This function extracts metadata from a DataFrame, such as column names, numerical
     columns, categorical columns, and data types, and returns it as a dictionary. The
-    function is cached to optimize performance.
+    result is cached per dataset fingerprint and shared by every session.
+    Args:
+        fingerprint (str): Dataset fingerprint, the cache key.
+        file_name (str): The name of the uploaded file.
+        _df (pd.DataFrame): The DataFrame (not hashed by streamlit).
     Returns:
         dict: A dictionary containing the following keys:
             - "file_name" (str): The name of the file associated with the DataFrame.
@@ -134,13 +253,17 @@ def get_context() -> dict:
             - "numerical_columns" (list): A list of column names with numerical data types.
             - "categorical_columns" (list): A list of column names with non-numerical data types.
             - "dtypes" (pandas.Series): A Series object containing the data types of each column.
+            - "profile" (str): Compact per column statistics and sample rows.
     """
-    df = st.session_state["df"]
-    file_name = st.session_state["file_name"]
-    columns = str(df.columns.tolist())
-    numerical_columns = str(df.select_dtypes(include=["number"]).columns.tolist())
-    categorical_columns = str(df.select_dtypes(exclude=["number"]).columns.tolist())
-    dtypes = str(df.dtypes.to_dict())
+    df = _df
+    with span("get_context"):
+        columns = str(df.columns.tolist())
+        numerical_columns = str(df.select_dtypes(include=["number"]).columns.tolist())
+        categorical_columns = str(df.select_dtypes(exclude=["number"]).columns.tolist())
+        dtypes = str(df.dtypes.to_dict())
+        dataset = get_dataset_registry().get(fingerprint)
+        path = dataset.path if dataset is not None and dataset.lazy else None
+        profile = format_profile(get_profile(fingerprint, df, path))
 
     context = {
         "file_name": file_name,
@@ -148,6 +271,7 @@ def get_context() -> dict:
         "numerical_columns": numerical_columns,
         "categorical_columns": categorical_columns,
         "dtypes": dtypes,
+        "profile": profile,
     }
     return context
 
@@ -155,11 +279,13 @@ def get_context() -> dict:
 # ---------------------------------------------------------------------------- #
 
 
-@st.cache_data
-def get_questions() -> list[str] | None:
+def get_questions(context: dict) -> list[str] | None:
     """
     Generates a list of 15+ questions that a data analyst can plot based on the provided dataset context.
 
+    Args:
+        context (dict): The dataset context from `get_context`.
+
     Returns:
         list[str]: A list of questions generated by the language model, e.g.,
                    ['What is the average age of customers?', 'How many unique products are sold?']
@@ -171,12 +297,16 @@ def get_questions() -> list[str] | None:
     also do not use apostrophes in the output.
     eg: ['What is the average age of customers?', 'How many unique products are sold?', 'Correlation between attendance and exam score?']
     
-    Data Name: {st.session_state["context"]["file_name"]}
-    Numerical Columns: {st.session_state["context"]["numerical_columns"]}
-    Categorical Columns: {st.session_state["context"]["categorical_columns"]} 
+    Data Name: {context["file_name"]}
+    Numerical Columns: {context["numerical_columns"]}
+    Categorical Columns: {context["categorical_columns"]} 
+    Column Profile:
+    {context["profile"]}
     """
 
-    response = callOllama(prompt, model="gemma3")
+    # Suggestions are background work, chat requests go first
+    with request_context(priority="batch"), span("get_questions"):
+        response = callOllama(prompt, model="gemma3")
 
     match = re.search(r"\[(?:'[^']*'(?:,\s*)?)*\]", response)
     if match:
@@ -191,8 +321,282 @@ def get_questions() -> list[str] | None:
 # ---------------------------------------------------------------------------- #
 
 
-@st.cache_data
-def execute(response: str) -> None:
+def get_queue_stats() -> dict | None:
+    """
+    Queue stats of the shared scheduler (`ollama_scheduler.py`), as last read
+    by the background health monitor, so a rerun makes no request.
+    Returns:
+        dict | None: The stats, or None when the app talks to Ollama directly.
+    """
+    return get_monitor().queue
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def debug_panel() -> None:
+    """
+    Shows the most recent spans and the raw metrics (see `utils.metrics`).
+    """
+    metrics = get_metrics()
+    spans = list(metrics.spans)[::-1]
+    if spans:
+        st.dataframe(pd.DataFrame(spans), hide_index=True)
+    else:
+        st.caption("Nothing recorded yet.")
+    st.code(metrics.render(), language="text")
+
+
+# ---------------------------------------------------------------------------- #
+
+
+@st.cache_resource
+def get_question_jobs() -> BackgroundCache:
+    """
+    Returns the process wide background runner for `get_questions`.
+    Returns:
+        BackgroundCache: Question jobs keyed by dataset fingerprint.
+    """
+    return BackgroundCache(get_questions)
+
+
+def request_questions(fingerprint: str, context: dict) -> Future:
+    """
+    Starts generating question suggestions in the background, once per dataset.
+    Args:
+        fingerprint (str): Dataset fingerprint.
+        context (dict): The dataset context from `get_context`.
+    Returns:
+        Future: Resolves to the list of questions (or None).
+    """
+    return get_question_jobs().submit(fingerprint, context)
+
+
+# ---------------------------------------------------------------------------- #
+
+
+@st.cache_resource
+def get_dataset_registry() -> DatasetRegistry:
+    """
+    Returns the process wide registry of parsed uploads.
+    Returns:
+        DatasetRegistry: Datasets shared by every session, keyed by content hash.
+    """
+    return DatasetRegistry()
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def load_dataset(file) -> None:
+    """
+    Puts the uploaded file into the session state as a view of the shared dataset.
+
+    The upload is hashed once per file. A CSV (optionally gz / zst compressed) is
+    parsed only the first time any session uploads those bytes, in chunks on a
+    background thread (see `utils.ingest`). Until parsing finishes, `df` holds a
+    small sample so the context and the question suggestions can already be
+    built, and `ingest` holds the running job. Parquet and Feather uploads are
+    stored as they are and never parsed up front.
+    Args:
+        file (UploadedFile): The file from `st.file_uploader`.
+    """
+    if st.session_state.get("file_id") == file.file_id:
+        return
+
+    registry = get_dataset_registry()
+    key = content_hash(file)
+    if st.session_state["fingerprint"] is not None:
+        registry.release(st.session_state["fingerprint"], get_script_run_ctx().session_id)
+    st.session_state["file_id"] = file.file_id
+    st.session_state["file_name"] = file.name
+    st.session_state["context"] = None
+    st.session_state["questions"] = None
+    # A parse still running for the previous upload no longer belongs to this session
+    st.session_state["ingest"] = None
+    st.session_state["ingest_key"] = None
+
+    ext = file.name.rsplit(".", 1)[-1].lower()
+    if ext in LAZY_FORMATS:
+        with span("dataset_store", format=ext):
+            registry.get_or_load(key, file.name, lambda: save_upload(file, key, ext))
+    elif registry.get(key) is None:
+        compression = CSV_COMPRESSION.get(ext)
+        job = registry.ingest(
+            key,
+            file.name,
+            lambda: CsvIngest(file, file.size, compression=compression),
+        )
+        job.sample_ready.wait()
+        st.session_state["ingest"] = job
+        st.session_state["ingest_key"] = key
+        st.session_state["df"] = job.sample
+        st.session_state["fingerprint"] = f"{key}:sample"
+        return
+    use_dataset(key)
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def finish_ingest() -> None:
+    """
+    Swaps the sample for the full dataset once the background parse is done,
+    or reports the parse error.
+    """
+    job = st.session_state["ingest"]
+    st.session_state["ingest"] = None
+    if job.error is not None:
+        st.session_state["df"] = None
+        st.session_state["file_id"] = None
+        st.sidebar.error(f"Could not read the file: {job.error}")
+        return
+    use_dataset(st.session_state["ingest_key"])
+    # dtypes of the full data can differ slightly from the sample's
+    st.session_state["context"] = None
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def use_dataset(key: str) -> None:
+    """
+    Points the session at a loaded dataset and takes a reference on it.
+    Args:
+        key (str): Content hash of the dataset.
+    """
+    registry = get_dataset_registry()
+    session_id = get_script_run_ctx().session_id
+    dataset = registry.get(key)
+    registry.acquire(key, session_id)
+    registry.evict(runtime.get_instance().is_active_session)
+
+    # Lazy datasets only put their (empty) schema in the session, generated code
+    # reads the data on demand through a `LazyNamespace`.
+    st.session_state["df"] = schema_frame(dataset.path) if dataset.lazy else dataset.view()
+    st.session_state["fingerprint"] = key
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def current_dataset() -> Dataset | None:
+    """
+    Returns the session's dataset from the registry.
+
+    A dataset can be evicted (and its file deleted) while the session still
+    holds its frame, e.g. after the session's reference was dropped. A parsed
+    CSV is then stored again from that frame; a Parquet / Feather upload only
+    exists as the uploaded file and can't be restored.
+    Returns:
+        Dataset | None: The dataset, or None if it has to be uploaded again.
+    """
+    registry = get_dataset_registry()
+    key = st.session_state["fingerprint"]
+    dataset = registry.get(key)
+    ext = st.session_state["file_name"].rsplit(".", 1)[-1].lower()
+    if dataset is None and ext not in LAZY_FORMATS:
+        df = st.session_state["df"]
+        dataset = registry.get_or_load(
+            key, st.session_state["file_name"], lambda: write_arrow(df, key)
+        )
+        registry.acquire(key, get_script_run_ctx().session_id)
+    return dataset
+
+
+# ---------------------------------------------------------------------------- #
+
+
+@st.cache_resource
+def get_artifact_store() -> ArtifactStore:
+    """
+    Returns the process wide store of recorded code outputs.
+    Returns:
+        ArtifactStore: Bounded LRU of replayable streamlit elements.
+    """
+    return ArtifactStore()
+
+
+@st.cache_resource
+def get_worker_pool() -> WorkerPool:
+    """
+    Returns the process wide pool of sandbox workers that run generated code.
+    Returns:
+        WorkerPool: Pre-warmed worker processes.
+    """
+    return WorkerPool()
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def repair_code(code: str, error: str, model: str = "qwen2.5-coder:7b") -> str | None:
+    """
+    Asks the model to fix code that failed validation or raised, sending only
+    the code, the error and the columns instead of the whole original prompt.
+    Args:
+        code (str): The failing code.
+        error (str): The validation problem or the exception message.
+        model (str, optional): Model that wrote the code. Defaults to "qwen2.5-coder:7b".
+    Returns:
+        str | None: The corrected code, or None if the answer has no code block.
+    """
+    context = st.session_state["context"]
+    prompt = f"""This Python code runs with a pandas DataFrame in the variable df,
+streamlit as st and sql(query) for DuckDB SQL on the table data. It failed with:
+{error}
+
+The columns are {context["columns"]} with data types {context["dtypes"]}.
+
+Fix the code. Reply with only the corrected code in one ```python block.
+```python
+{code}```"""
+    cache = get_response_cache()
+    key = make_key(model, prompt, "repair")
+    response = cache.get(key)
+    if response is None:
+        with span("repair_code", model=model):
+            response = get_client().chat(
+                model,
+                [{"role": "user", "content": prompt}],
+                options={"num_predict": repair_tokens},
+            ).get("message", {}).get("content", "")
+        cache.set(key, response)
+    return extract_code(response)
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def _recorded_error(elements: list) -> str | None:
+    # A failed run ends with the st.error added by `execute`
+    if elements and elements[-1][0] == "error":
+        message = str(elements[-1][1][0][1])
+        if message.startswith(ERROR_PREFIX):
+            return message[len(ERROR_PREFIX):]
+    return None
+
+
+def _recorded_code(elements: list, code: str) -> str:
+    # A repaired run starts with the caption and the fixed code added by `execute`
+    if (
+        len(elements) > 1
+        and elements[0][0] == "caption"
+        and str(elements[0][1][0][1]).startswith(REPAIR_PREFIX)
+        and elements[1][0] == "code"
+    ):
+        return str(elements[1][1][0][1])
+    return code
+
+
+def _columns() -> list[str] | None:
+    try:
+        return ast.literal_eval(st.session_state["context"]["columns"])
+    except (TypeError, KeyError, ValueError, SyntaxError):
+        return None
+
+
+def execute(response: str) -> tuple[str | None, str | None]:
     """
     Extracts and executes Python code embedded within a response string.
 
@@ -200,22 +604,214 @@ def execute(response: str) -> None:
     string, extracts the code, and executes it using the `exec` function. If
     an error occurs during execution, it displays the error message.
 
+    The code is checked first (syntax, imports, column names, see
+    `utils.validate`). Code that fails the checks or raises is sent back to the
+    model with the error for a short fix (up to `max_repairs` times) instead of
+    regenerating the whole answer; the code that finally ran is shown with the
+    output.
+
+    The code runs in a sandboxed worker process (see `utils.sandbox`), and its
+    streamlit output is recorded and stored, keyed by the code and the dataset
+    fingerprint, so rendering the chat history replays it instead of executing
+    the code again on every rerun.
+
     Args:
         response (str): The input string containing a Python code block
                         enclosed in triple backticks (```python ... ```).
 
     Returns:
-        None: This function does not return a value.
+        tuple[str | None, str | None]: The error of the last attempt (None if
+        the code ran) and the code of that attempt, which differs from the
+        response's code after a repair (None if the response has no code).
     """
 
-    match = re.search(r"```python\s*\n(.*?)```", response, re.DOTALL)
-
-    if match:
-        code = match.group(1)
+    code = extract_code(response)
+    if code is None:
+        return None, None
+
+    with span("execute") as labels:
+        store = get_artifact_store()
+        key = make_key(code, st.session_state["fingerprint"])
+        elements = store.get(key)
+        if elements is not None:
+            labels["path"] = "replay"
+            replay(elements, st)
+            return _recorded_error(elements), _recorded_code(elements, code)
+
+        dataset = current_dataset()
+        if dataset is None:
+            labels["path"] = "missing"
+            st.error(MISSING_DATASET)
+            return MISSING_DATASET, code
+        columns = _columns()
+        for attempt in range(max_repairs + 1):
+            status, elements = "invalid", []
+            error = validate_code(code, columns)
+            if error is None and uses_unreplayable(code):
+                # Would only come back "unsupported" from the worker
+                status = "unsupported"
+            elif error is None:
+                status, elements, error = get_worker_pool().run(code, dataset.path)
+            if status not in ("invalid", "error") or attempt == max_repairs:
+                break
+            # Only the failing code and the error go back to the model
+            fixed = repair_code(code, error)
+            if fixed is None:
+                break
+            code = fixed
+
+        labels["path"] = {"unsupported": "in_process", "invalid": "rejected"}.get(status, "worker")
+        labels["repairs"] = attempt
+        if attempt:
+            get_metrics().inc("code_repairs_total", outcome="fixed" if error is None else "failed")
+
+        if status != "unsupported":
+            recorder = Recorder(None)
+            if attempt:
+                outcome = "fixed" if error is None else "last attempted fix"
+                recorder.caption(f"{REPAIR_PREFIX}{outcome} after {attempt} repair(s):")
+                recorder.code(code, language="python")
+            elements = recorder.elements + elements
+            if error is not None:
+                recorder = Recorder(None)
+                recorder.error(f"{ERROR_PREFIX}{error}")
+                elements += recorder.elements
+            replay(elements, st)
+            # Timeouts, a dead worker or rejected code say nothing lasting
+            # about the code's output, so they run again next time
+            if status in ("ok", "error"):
+                store.put(key, elements)
+            return error, code
+
+        # Layouts and widgets can't be shipped back from a worker, so this code
+        # runs in-process and is not recorded. Its output is already on the page
+        # when it fails, so it is not repaired.
+        recorder = Recorder(st)
+        error = None
         try:
-            exec(code, {"df": st.session_state.df, "st": st})
+            LazyNamespace(
+                dataset.path,
+                dataset.view,
+                st=recorder,
+                __builtins__=recorder.builtins(),
+            ).run(code)
         except Exception as e:
-            st.error(f"An error occurred: {e}")
+            error = describe_error(e)
+            recorder.error(f"{ERROR_PREFIX}{error}")
+        if recorder.replayable:
+            store.put(key, recorder.elements)
+        return error, code
+
+
+# ---------------------------------------------------------------------------- #
+#                        S I M I L A R   Q U E S T I O N S                     #
+# ---------------------------------------------------------------------------- #
+
+
+@st.cache_resource
+def get_question_index() -> QuestionIndex:
+    """
+    Returns the process wide index of answered questions.
+    Returns:
+        QuestionIndex: Embeddings of past questions and their working answers.
+    """
+    return QuestionIndex()
+
+
+def embed_question(question: str) -> np.ndarray | None:
+    """
+    Embeds a question with `EMBED_MODEL`.
+    Returns:
+        np.ndarray | None: The embedding, or None if the model isn't available
+        (reusing answers is then simply skipped).
+    """
+    try:
+        with span("embed_question"):
+            response = get_client().embed(EMBED_MODEL, question)
+        return np.asarray(response["embeddings"][0], dtype=np.float32)
+    except Exception:
+        return None
+
+
+def find_similar_answer(question: str) -> tuple[dict | None, np.ndarray | None]:
+    """
+    Looks for an earlier answer to the same question in other words, on data
+    with the same schema.
+
+    A match above `similarity_threshold` is only reused after a dry run: its
+    code must pass `validate_code` and run without errors on the current data
+    in a sandbox worker, or have a stored run without errors. The recorded
+    output is stored, so `execute` only replays it.
+
+    Args:
+        question (str): The user's question.
+
+    Returns:
+        tuple[dict | None, np.ndarray | None]: {"question", "answer", "score"} of
+        the reused answer (or None), and the question's embedding to pass to
+        `remember_answer` (None if embeddings are unavailable).
+    """
+    vector = embed_question(question)
+    if vector is None:
+        return None, None
+    metrics = get_metrics()
+    schema = schema_fingerprint(st.session_state["context"])
+    index = get_question_index()
+    match = index.search(schema, question, vector)
+    if match is None:
+        metrics.inc("similar_questions_total", result="miss")
+        return None, vector
+
+    score, similar, answer = match
+    code = extract_code(answer)
+    if code is None or validate_code(code, _columns()) is not None:
+        metrics.inc("similar_questions_total", result="rejected")
+        return None, vector
+
+    store = get_artifact_store()
+    key = make_key(code, st.session_state["fingerprint"])
+    stored = store.get(key)
+    if stored is not None and _recorded_error(stored) is not None:
+        # Already known to fail on this data
+        index.remove(schema, similar)
+        metrics.inc("similar_questions_total", result="rejected")
+        return None, vector
+    if stored is None:
+        dataset = current_dataset()
+        if dataset is None:
+            metrics.inc("similar_questions_total", result="rejected")
+            return None, vector
+        with span("dry_run") as labels:
+            status, elements, error = get_worker_pool().run(code, dataset.path)
+            labels["status"] = status
+        if status == "ok":
+            store.put(key, elements)
+        elif status != "unsupported":
+            if status == "error":
+                index.remove(schema, similar)
+            metrics.inc("similar_questions_total", result="rejected")
+            return None, vector
+
+    metrics.inc("similar_questions_total", result="hit")
+    return {"question": similar, "answer": answer, "score": score}, vector
+
+
+def remember_answer(question: str, vector: np.ndarray, answer: str, code: str | None) -> None:
+    """
+    Adds an answer whose code ran without errors to the question index.
+    Args:
+        question (str): The user's question.
+        vector (np.ndarray): Its embedding, from `find_similar_answer`.
+        answer (str): The model's answer.
+        code (str | None): The code that ran, from `execute`.
+    """
+    original = extract_code(answer)
+    if code is None or original is None:
+        return
+    # After a repair the answer is stored with the fixed code, not the broken one
+    answer = answer.replace(original, code)
+    schema = schema_fingerprint(st.session_state["context"])
+    get_question_index().add(schema, question, vector, answer)
 
 
 # ------------------------------------ End ----------------------------------- #
@@ -0,0 +1,155 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import subprocess
+import threading
+import time
+
+from utils.ollama_client import OllamaClient, request_context
+from utils.semantic import EMBED_MODEL
+
+# ------------------------------- Configuration ------------------------------ #
+REQUIRED_MODELS: list[str] = ["qwen2.5-coder:7b", "gemma3", EMBED_MODEL]
+poll_interval: float = 10.0
+status_ttl: float = 15.0
+keep_alive: str = "30m"
+start_timeout: float = 30.0
+
+
+# ---------------------------------------------------------------------------- #
+#                                  M O N I T O R                               #
+# ---------------------------------------------------------------------------- #
+
+
+def has_model(pulled: list[str], model: str) -> bool:
+    """True if `model` is among the `pulled` names ("gemma3" matches "gemma3:latest")."""
+    return model in pulled or (":" not in model and f"{model}:latest" in pulled)
+
+
+class OllamaMonitor:
+    """
+    Process wide Ollama health monitor.
+
+    A background thread checks the server every `poll_interval` seconds and keeps
+    the result, so a script run reads a cached status instead of making a
+    request. Whenever the server is up it also checks that the required models
+    are pulled, reads the scheduler queue stats and preloads each model once
+    (empty prompt with `keep_alive`), so the first question doesn't pay the
+    model load time.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        models: list[str] = REQUIRED_MODELS,
+        interval: float = poll_interval,
+    ) -> None:
+        self.client = client
+        self.models = models
+        self.interval = interval
+        self.online = False
+        self.checked = 0.0
+        self.missing: list[str] = []
+        self.queue: dict | None = None
+        self.warm: set[str] = set()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._server: subprocess.Popen | None = None
+        self.refresh()
+        threading.Thread(target=self._loop, name="ollama-monitor", daemon=True).start()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.refresh()
+
+    def refresh(self) -> None:
+        """Checks the server and the required models right now."""
+        with self._lock:
+            online = self.client.is_running()
+            missing, queue = [], None
+            if online:
+                try:
+                    pulled = self.client.list_models()
+                    missing = [m for m in self.models if not has_model(pulled, m)]
+                except Exception:
+                    online = False
+            if online:
+                queue = self.client.scheduler_stats()
+            else:
+                self.warm.clear()
+            self.online, self.missing, self.queue = online, missing, queue
+            self.checked = time.monotonic()
+            if online:
+                for model in self.models:
+                    if model not in missing and model not in self.warm:
+                        self._preload(model)
+
+    def _preload(self, model: str) -> None:
+        self.warm.add(model)
+        with request_context(priority="batch"):
+            if model == EMBED_MODEL:
+                future = self.client.submit_embed(model, "", keep_alive=keep_alive)
+            else:
+                future = self.client.submit_generate(model, "", keep_alive=keep_alive)
+
+        def retry_later(done) -> None:
+            if done.exception() is not None:
+                self.warm.discard(model)
+
+        future.add_done_callback(retry_later)
+
+    def is_running(self, max_age: float = status_ttl) -> bool:
+        """
+        The cached server status, refreshed first only if it is older than `max_age`.
+        """
+        if time.monotonic() - self.checked > max_age:
+            self.refresh()
+        return self.online
+
+    def wait_until_ready(self, timeout: float = start_timeout) -> bool:
+        """
+        Polls the server with exponential backoff (0.1 s doubling up to 2 s)
+        until it answers or `timeout` runs out.
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.1
+        while time.monotonic() < deadline:
+            if self.client.is_running():
+                self._wake.set()
+                return True
+            time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, 2.0)
+        return False
+
+    def start_server(self, timeout: float = start_timeout) -> bool:
+        """
+        Runs `ollama serve` unless the server is up or the one this process
+        started is still running, however many sessions ask. It doesn't wait:
+        a background thread waits up to `timeout` for the server and then
+        wakes the monitor.
+        Returns:
+            bool: True if the server is up already.
+        """
+        with self._start_lock:
+            if self.client.is_running():
+                self._wake.set()
+                return True
+            if self._server is None or self._server.poll() is not None:
+                self._server = subprocess.Popen(
+                    ["ollama", "serve"],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                threading.Thread(
+                    target=self.wait_until_ready,
+                    args=(timeout,),
+                    name="ollama-start",
+                    daemon=True,
+                ).start()
+        return False
+
+
+# ------------------------------------ End ----------------------------------- #
@@ -0,0 +1,130 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import threading
+from typing import BinaryIO, Callable
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import span
+
+# ------------------------------- Configuration ------------------------------ #
+chunk_rows: int = 200_000
+sample_rows: int = 1_000
+# Text columns become categoricals only with few distinct values: at most this
+# share of the rows and at most `max_categories` values.
+category_ratio: float = 0.05
+max_categories: int = 10_000
+
+
+# ---------------------------------------------------------------------------- #
+#                                  D T Y P E S                                 #
+# ---------------------------------------------------------------------------- #
+
+
+def downcast_numbers(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrinks numeric columns to the smallest width that holds their values.
+    Integers are always downcast; floats only when float32 is lossless.
+
+    Args:
+        df (pd.DataFrame): A parsed chunk.
+
+    Returns:
+        pd.DataFrame: The same frame with narrower numeric dtypes.
+    """
+    for column in df.select_dtypes(include=["integer"]).columns:
+        df[column] = pd.to_numeric(df[column], downcast="integer")
+    for column in df.select_dtypes(include=["float"]).columns:
+        values = df[column].to_numpy()
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow, values, equal_nan=True):
+            df[column] = narrow
+    return df
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def categorize(
+    df: pd.DataFrame, ratio: float = category_ratio, limit: int = max_categories
+) -> pd.DataFrame:
+    """
+    Turns low cardinality text columns into categoricals.
+
+    Args:
+        df (pd.DataFrame): The full frame (or a sample).
+        ratio (float, optional): Max unique values / rows to count as low cardinality.
+        limit (int, optional): Max unique values, whatever the number of rows.
+
+    Returns:
+        pd.DataFrame: The same frame with categorical text columns.
+    """
+    for column in df.select_dtypes(include=["object", "string"]).columns:
+        if df[column].nunique(dropna=True) <= min(ratio * len(df), limit):
+            df[column] = df[column].astype("category")
+    return df
+
+
+# ---------------------------------------------------------------------------- #
+#                                   I N G E S T                                #
+# ---------------------------------------------------------------------------- #
+
+
+class CsvIngest:
+    """
+    Parses a CSV in chunks on a background thread.
+
+    A small sample (header plus `sample_rows` rows) is parsed first and exposed as
+    `sample`, so schema level features can start right away; `progress` tracks
+    the bytes consumed, and `frame` holds the full, downcast DataFrame once
+    `done` is set (or `error` if parsing failed).
+    """
+
+    def __init__(self, file: BinaryIO, size: int, **read_csv_kwargs) -> None:
+        self.file = file
+        self.size = max(size, 1)
+        self.read_csv_kwargs = read_csv_kwargs
+        self.sample: pd.DataFrame | None = None
+        self.frame: pd.DataFrame | None = None
+        self.error: Exception | None = None
+        self.progress = 0.0
+        self.sample_ready = threading.Event()
+        self.done = threading.Event()
+        self.on_done: Callable[["CsvIngest"], None] | None = None
+
+    def start(self) -> "CsvIngest":
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            with span("csv_sample"):
+                self.file.seek(0)
+                sample = pd.read_csv(self.file, nrows=sample_rows, **self.read_csv_kwargs)
+                self.sample = categorize(downcast_numbers(sample))
+            self.sample_ready.set()
+
+            with span("csv_parse"):
+                self.file.seek(0)
+                chunks = []
+                with pd.read_csv(
+                    self.file, chunksize=chunk_rows, **self.read_csv_kwargs
+                ) as reader:
+                    for chunk in reader:
+                        chunks.append(downcast_numbers(chunk))
+                        self.progress = min(self.file.tell() / self.size, 1.0)
+                frame = pd.concat(chunks, ignore_index=True) if chunks else self.sample
+                self.frame = categorize(frame)
+            self.progress = 1.0
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.on_done is not None:
+                self.on_done(self)
+            self.sample_ready.set()
+            self.done.set()
+
+
+# ------------------------------------ End ----------------------------------- #
@@ -0,0 +1,238 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Generator, Iterable, Iterator
+
+# ------------------------------- Configuration ------------------------------ #
+# This module is kept identical in both apps (only METRICS_PREFIX differs):
+# each app is deployed and run on its own from its folder.
+# Set METRICS_PORT to serve /metrics, METRICS_FILE to write the same text to a
+# file (e.g. for node_exporter's textfile collector) every `write_interval` s.
+METRICS_PORT: str | None = os.environ.get("METRICS_PORT")
+METRICS_FILE: str | None = os.environ.get("METRICS_FILE")
+METRICS_PREFIX: str = "datars"
+write_interval: float = 15.0
+recent_spans: int = 200
+TIME_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+)
+RATE_BUCKETS: tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+# ---------------------------------------------------------------------------- #
+#                                  M E T R I C S                               #
+# ---------------------------------------------------------------------------- #
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    """
+    Thread safe registry of counters and histograms, rendered in the
+    Prometheus text format, plus the last `recent_spans` spans for the debug
+    panel.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX) -> None:
+        self.prefix = prefix
+        self.spans: deque = deque(maxlen=recent_spans)
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, list] = {}
+        self._buckets: dict[str, tuple[float, ...]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        """Adds `value` to the counter `name`."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(
+        self, name: str, value: float, buckets: tuple[float, ...] = TIME_BUCKETS, **labels
+    ) -> None:
+        """Records `value` in the histogram `name` (buckets are fixed on first use)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            bounds = self._buckets.setdefault(name, buckets)
+            histogram = self._histograms.setdefault(key, [[0] * len(bounds), 0.0, 0])
+            for index, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextlib.contextmanager
+    def span(self, name: str, **labels) -> Iterator[dict]:
+        """
+        Times the block into the `<name>_seconds` histogram and the recent
+        spans. The yielded dict can be used to add labels from inside the block
+        (e.g. whether a cache was hit); failures are labelled error="true".
+        """
+        extra: dict = {}
+        start = time.perf_counter()
+        error = False
+        try:
+            yield extra
+        except BaseException:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            labels = {**labels, **extra}
+            if error:
+                labels["error"] = "true"
+            self.observe(f"{name}_seconds", elapsed, **labels)
+            self.spans.append(
+                {"time": time.strftime("%H:%M:%S"), "span": name, "seconds": round(elapsed, 4), **labels}
+            )
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            seen = set()
+            for (name, labels), value in counters:
+                full = f"{self.prefix}_{name}"
+                if full not in seen:
+                    lines.append(f"# TYPE {full} counter")
+                    seen.add(full)
+                lines.append(f"{full}{_labels(dict(labels))} {value}")
+            for (name, labels), (counts, total, count) in histograms:
+                full = f"{self.prefix}_{name}"
+                if full not in seen:
+                    lines.append(f"# TYPE {full} histogram")
+                    seen.add(full)
+                labels = dict(labels)
+                for bound, bucket in zip(self._buckets[name], counts):
+                    lines.append(f"{full}_bucket{_labels({**labels, 'le': bound})} {bucket}")
+                lines.append(f"{full}_bucket{_labels({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{full}_sum{_labels(labels)} {total}")
+                lines.append(f"{full}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Writes `render()` to `path` atomically."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(temporary, path)
+
+
+# ---------------------------------------------------------------------------- #
+#                                  E X P O R T                                 #
+# ---------------------------------------------------------------------------- #
+
+
+def serve(metrics: Metrics, port: int) -> ThreadingHTTPServer:
+    """Serves `metrics.render()` on http://0.0.0.0:`port`/metrics in a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def _write_forever(metrics: Metrics, path: str) -> None:
+    while True:
+        time.sleep(write_interval)
+        try:
+            metrics.write(path)
+        except OSError:
+            pass
+
+
+_metrics: Metrics | None = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """
+    Returns the process wide registry, starting the /metrics endpoint and / or
+    the file writer on first use when METRICS_PORT / METRICS_FILE are set.
+    Returns:
+        Metrics: The shared registry.
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+            if METRICS_PORT:
+                serve(_metrics, int(METRICS_PORT))
+            if METRICS_FILE:
+                threading.Thread(
+                    target=_write_forever, args=(_metrics, METRICS_FILE), name="metrics-file", daemon=True
+                ).start()
+        return _metrics
+
+
+def span(name: str, **labels):
+    """Shortcut for `get_metrics().span(...)`."""
+    return get_metrics().span(name, **labels)
+
+
+def timed_stream(stream: Iterable, name: str, **labels) -> Generator:
+    """
+    Passes a token stream through, recording `<name>_ttft_seconds` (time to the
+    first chunk), `<name>_seconds` and `<name>_tokens_per_second` (one chunk
+    counted as one token) once it is exhausted.
+    """
+    metrics = get_metrics()
+    start = time.perf_counter()
+    first = None
+    tokens = 0
+    for chunk in stream:
+        if first is None:
+            first = time.perf_counter() - start
+            metrics.observe(f"{name}_ttft_seconds", first, **labels)
+        tokens += 1
+        yield chunk
+    elapsed = time.perf_counter() - start
+    metrics.observe(f"{name}_seconds", elapsed, **labels)
+    if first is not None and elapsed > first:
+        metrics.observe(
+            f"{name}_tokens_per_second", tokens / (elapsed - first), buckets=RATE_BUCKETS, **labels
+        )
+    metrics.spans.append(
+        {
+            "time": time.strftime("%H:%M:%S"),
+            "span": name,
+            "seconds": round(elapsed, 4),
+            "ttft": round(first or 0.0, 4),
+            "tokens": tokens,
+            **labels,
+        }
+    )
+
+
+# ------------------------------------ End ----------------------------------- #
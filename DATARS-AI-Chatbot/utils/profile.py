@@ -0,0 +1,170 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import numpy as np
+import pandas as pd
+
+from utils.datasets import connect
+
+# ------------------------------- Configuration ------------------------------ #
+top_k: int = 5
+sample_rows: int = 3
+exact_unique_limit: int = 200_000
+hll_precision: int = 14
+max_value_chars: int = 40
+
+
+# ---------------------------------------------------------------------------- #
+#                               C A R D I N A L I T Y                          #
+# ---------------------------------------------------------------------------- #
+
+
+def hyperloglog(values: pd.Series, precision: int = hll_precision) -> int:
+    """
+    Estimates the number of distinct values with HyperLogLog (~1% error at the
+    default precision), using vectorized hashing instead of a hash set.
+
+    Args:
+        values (pd.Series): The column to count.
+        precision (int, optional): log2 of the number of registers.
+
+    Returns:
+        int: The estimated number of distinct non-null values.
+    """
+    hashes = pd.util.hash_pandas_object(values.dropna(), index=False).to_numpy()
+    if len(hashes) == 0:
+        return 0
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes << np.uint64(precision)
+    # rank = position of the first set bit in the remaining bits (1 based)
+    bits = 64 - precision
+    rank = np.full(len(rest), bits + 1, dtype=np.uint8)
+    nonzero = rest != 0
+    rank[nonzero] = 64 - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+
+    m = float(len(registers))
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.power(2.0, -registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+    return int(round(estimate))
+
+
+# ---------------------------------------------------------------------------- #
+#                                  P R O F I L E                               #
+# ---------------------------------------------------------------------------- #
+
+
+def profile_frame(df: pd.DataFrame) -> dict:
+    """
+    Per column statistics of a DataFrame: dtype, null count, (approximate)
+    cardinality, min / max and the most frequent values, plus a few sample rows.
+
+    Args:
+        df (pd.DataFrame): The data to profile.
+
+    Returns:
+        dict: {"rows": int, "columns": {name: stats}, "sample": list[dict]}
+    """
+    nulls = df.isna().sum()
+    numeric = df.select_dtypes(include=["number", "datetime"])
+    minimum, maximum = numeric.min(), numeric.max()
+
+    columns = {}
+    for name in df.columns:
+        column = df[name]
+        stats = {"dtype": str(column.dtype), "nulls": int(nulls[name])}
+        if len(column) <= exact_unique_limit:
+            stats["unique"] = int(column.nunique(dropna=True))
+        else:
+            stats["unique"] = hyperloglog(column)
+            stats["approx"] = True
+        if name in numeric.columns:
+            stats["min"], stats["max"] = minimum[name], maximum[name]
+        elif stats["unique"] < len(column):
+            counts = column.value_counts(dropna=True).head(top_k)
+            stats["top"] = counts.index.tolist()
+        columns[name] = stats
+
+    sample = df.sample(min(sample_rows, len(df)), random_state=0) if len(df) else df
+    return {
+        "rows": len(df),
+        "columns": columns,
+        "sample": sample.to_dict(orient="records"),
+    }
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def profile_path(path: str) -> dict:
+    """
+    Same as `profile_frame` for a lazily stored dataset, computed by DuckDB's
+    SUMMARIZE (one scan, HyperLogLog cardinality) without loading it into pandas.
+
+    Args:
+        path (str): Dataset file stored by `utils.datasets`.
+
+    Returns:
+        dict: {"rows": int, "columns": {name: stats}, "sample": list[dict]}
+    """
+    con = connect(path)
+    summary = con.sql("SUMMARIZE data").df()
+    columns = {}
+    rows = int(summary["count"].max()) if len(summary) else 0
+    for record in summary.to_dict(orient="records"):
+        columns[record["column_name"]] = {
+            "dtype": record["column_type"],
+            "nulls": int(round(float(record["null_percentage"]) * rows / 100)),
+            "unique": int(record["approx_unique"]),
+            "approx": True,
+            "min": record["min"],
+            "max": record["max"],
+        }
+    sample = con.sql(f"SELECT * FROM data USING SAMPLE {sample_rows} ROWS").df()
+    return {
+        "rows": rows,
+        "columns": columns,
+        "sample": sample.to_dict(orient="records"),
+    }
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def _short(value) -> str:
+    text = str(value)
+    return text if len(text) <= max_value_chars else text[: max_value_chars - 3] + "..."
+
+
+def format_profile(profile: dict) -> str:
+    """
+    Renders a profile as a compact block of text for the prompts, one line per
+    column.
+
+    Args:
+        profile (dict): Output of `profile_frame` or `profile_path`.
+
+    Returns:
+        str: The profile text.
+    """
+    lines = [f"{profile['rows']} rows"]
+    for name, stats in profile["columns"].items():
+        parts = [f"nulls={stats['nulls']}"]
+        parts.append(f"unique{'~' if stats.get('approx') else '='}{stats['unique']}")
+        if "min" in stats:
+            parts.append(f"range=[{_short(stats['min'])}, {_short(stats['max'])}]")
+        if "top" in stats:
+            parts.append("top=" + str([_short(value) for value in stats["top"]]))
+        lines.append(f"- {name} ({stats['dtype']}): " + ", ".join(parts))
+    if profile["sample"]:
+        lines.append("Sample rows:")
+        for row in profile["sample"]:
+            lines.append(str({key: _short(value) for key, value in row.items()}))
+    return "\n".join(lines)
+
+
+# ------------------------------------ End ----------------------------------- #
@@ -0,0 +1,227 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import multiprocessing as mp
+import os
+import queue
+import signal
+import time
+import traceback
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.artifacts import Recorder, UnsupportedElement
+from utils.datasets import LazyNamespace, read_frame
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall clock timeout applies
+    resource = None
+
+# ------------------------------- Configuration ------------------------------ #
+pool_size: int = int(os.environ.get("DATARS_WORKERS", max((os.cpu_count() or 2) // 2, 1)))
+cpu_seconds: int = 30
+memory_bytes: int = 4 * 1024 * 1024 * 1024
+wall_timeout: float = 60.0
+frames_per_worker: int = 2
+
+
+# ---------------------------------------------------------------------------- #
+#                                   W O R K E R                                #
+# ---------------------------------------------------------------------------- #
+
+
+class CpuLimitExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame) -> None:
+    raise CpuLimitExceeded("CPU time limit exceeded")
+
+
+def _set_cpu_limit(seconds: int | None) -> None:
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def describe_error(error: BaseException) -> str:
+    """
+    One line description of an exception raised by generated code, with the
+    line of the code it was raised from, e.g. "KeyError: 'Sales' (line 3)".
+    """
+    message = "".join(traceback.format_exception_only(type(error), error)).strip()
+    lines = [frame.lineno for frame in traceback.extract_tb(error.__traceback__) if frame.filename == "<string>"]
+    return f"{message} (line {lines[-1]})" if lines else message
+
+
+def _frame(frames: OrderedDict, path: str) -> pd.DataFrame:
+    """
+    The worker's frame for a stored dataset. For an Arrow file, numeric, date
+    and string columns are views of the memory map, so their pages are shared
+    with the server and the other workers; other columns and Parquet data are
+    a private copy per worker (see `utils.datasets.to_frame`).
+    """
+    if path not in frames:
+        frames[path] = read_frame(path)
+        while len(frames) > frames_per_worker:
+            frames.popitem(last=False)
+    frames.move_to_end(path)
+    return frames[path]
+
+
+def _worker_main(conn, memory_limit: int) -> None:
+    """
+    Worker loop: imports the heavy libraries once, keeps the last few datasets
+    loaded (only once code actually uses `df`) and runs jobs of the form
+    (code, dataset path, cpu seconds). Replies with (status, recorded elements,
+    error message).
+    """
+    import plotly.express  # noqa: F401  warm import for generated code
+
+    if resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+    frames: OrderedDict[str, pd.DataFrame] = OrderedDict()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        code, path, seconds = job
+        recorder = Recorder(None)
+        try:
+            # Shallow copy: column assignments in generated code don't leak into
+            # the next job that uses this worker.
+            namespace = LazyNamespace(
+                path,
+                lambda: _frame(frames, path).copy(deep=False),
+                st=recorder,
+                __builtins__=recorder.builtins(),
+            )
+            _set_cpu_limit(seconds)
+            namespace.run(code)
+            reply = ("ok", recorder.elements, None)
+        except UnsupportedElement as e:
+            reply = ("unsupported", recorder.elements, str(e))
+        except MemoryError:
+            reply = ("error", recorder.elements, "Memory limit exceeded")
+        except BaseException as e:
+            reply = ("error", recorder.elements, describe_error(e))
+        finally:
+            _set_cpu_limit(None)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send(("error", [], f"Could not send the result back: {e}"))
+
+
+# ---------------------------------------------------------------------------- #
+#                                     P O O L                                  #
+# ---------------------------------------------------------------------------- #
+
+
+class WorkerPool:
+    """
+    Pool of pre-warmed worker processes that run generated code outside the
+    Streamlit server process.
+
+    Each job gets a CPU time budget (rlimit) and a wall clock timeout; a worker
+    that times out, is cancelled or dies is killed and replaced with a fresh one.
+    """
+
+    def __init__(
+        self,
+        size: int = pool_size,
+        cpu_seconds: int = cpu_seconds,
+        memory_bytes: int = memory_bytes,
+        timeout: float = wall_timeout,
+    ) -> None:
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.timeout = timeout
+        # spawn: never fork the multi-threaded Streamlit server
+        self._ctx = mp.get_context("spawn")
+        self._idle: queue.Queue = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> tuple:
+        parent, child = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, args=(child, self.memory_bytes), daemon=True
+        )
+        process.start()
+        child.close()
+        return process, parent
+
+    def run(self, code: str, path: str) -> tuple[str, list, str | None]:
+        """
+        Runs `code` against the dataset stored at `path` in a worker.
+
+        Args:
+            code (str): Generated Python code.
+            path (str): Dataset file stored by `utils.datasets`.
+
+        Returns:
+            tuple[str, list, str | None]: Status ("ok", "error" if the code
+            raised, "crashed" if the worker died or timed out, or
+            "unsupported"), the recorded streamlit elements and an error message
+            if any.
+        """
+        worker = self._idle.get()
+        process, conn = worker
+        try:
+            conn.send((code, path, self.cpu_seconds))
+            deadline = time.monotonic() + self.timeout
+            while not conn.poll(0.05):
+                if not process.is_alive():
+                    worker = self._replace(worker)
+                    return "crashed", [], "The worker process died (memory limit?)"
+                if time.monotonic() > deadline:
+                    worker = self._replace(worker)
+                    return "crashed", [], f"Timed out after {self.timeout:.0f}s"
+            return conn.recv()
+        except (EOFError, OSError):
+            worker = self._replace(worker)
+            return "crashed", [], "Lost the connection to the worker process"
+        except BaseException:
+            # Includes Streamlit stopping the script run mid job.
+            worker = self._replace(worker)
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def _replace(self, worker: tuple) -> tuple:
+        process, conn = worker
+        process.kill()
+        conn.close()
+        return self._spawn()
+
+    def shutdown(self) -> None:
+        """Stops every idle worker."""
+        while not self._idle.empty():
+            process, conn = self._idle.get_nowait()
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+
+
+# ------------------------------------ End ----------------------------------- #
@@ -0,0 +1,139 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.cache import make_key
+
+# ------------------------------- Configuration ------------------------------ #
+EMBED_MODEL: str = "nomic-embed-text"
+# Cosine similarity above which two questions count as the same question
+similarity_threshold: float = 0.9
+max_entries: int = 5000
+
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+# ---------------------------------------------------------------------------- #
+#                                   I N D E X                                  #
+# ---------------------------------------------------------------------------- #
+
+
+def schema_fingerprint(context: dict) -> str:
+    """
+    Identifies a dataset by its columns and dtypes only, so code written for
+    one upload can be reused on any upload with the same schema.
+    """
+    return make_key(context["columns"], context["dtypes"])
+
+
+def normalize(vector) -> np.ndarray:
+    """Unit length float32 copy of an embedding (cosine similarity = dot product)."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class QuestionIndex:
+    """
+    In-process brute force vector index of answered questions:
+    (question, schema fingerprint) -> model answer with code that ran.
+
+    Vectors of one schema are kept in a single matrix, so a lookup is one
+    matrix-vector product. The oldest schemas are dropped once more than
+    `max_entries` questions are stored.
+    """
+
+    def __init__(self, max_entries: int = max_entries) -> None:
+        self.max_entries = max_entries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # schema -> [vectors (n x d), questions, answers]
+        self._schemas: OrderedDict[str, list] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, schema: str, question: str, vector, answer: str) -> None:
+        """Stores an answer that ran without errors."""
+        vector = normalize(vector)
+        with self._lock:
+            if schema in self._schemas:
+                vectors, questions, answers = self._schemas[schema]
+                if vectors.shape[1] != vector.shape[0]:
+                    # The embedding model changed, start over for this schema
+                    self.size -= len(questions)
+                    vectors, questions, answers = np.empty((0, len(vector)), np.float32), [], []
+            else:
+                vectors, questions, answers = np.empty((0, len(vector)), np.float32), [], []
+            if question in questions:
+                index = questions.index(question)
+                answers[index] = answer
+            else:
+                vectors = np.vstack([vectors, vector])
+                questions.append(question)
+                answers.append(answer)
+                self.size += 1
+            self._schemas[schema] = [vectors, questions, answers]
+            self._schemas.move_to_end(schema)
+            while self.size > self.max_entries and len(self._schemas) > 1:
+                _, (_, dropped, _) = self._schemas.popitem(last=False)
+                self.size -= len(dropped)
+
+    def search(
+        self, schema: str, question: str, vector, threshold: float = similarity_threshold
+    ) -> tuple[float, str, str] | None:
+        """
+        Finds the most similar answered question for the same schema.
+
+        Questions that mention different numbers ("top 5" / "top 10") never
+        match, however close their embeddings are.
+
+        Returns:
+            tuple[float, str, str] | None: (similarity, question, answer), or None.
+        """
+        vector = normalize(vector)
+        numbers = set(NUMBER.findall(question))
+        with self._lock:
+            entry = self._schemas.get(schema)
+            if entry is None or entry[0].shape[1] != vector.shape[0]:
+                self.misses += 1
+                return None
+            vectors, questions, answers = entry
+            scores = vectors @ vector
+            for index in np.argsort(scores)[::-1]:
+                if scores[index] < threshold:
+                    break
+                if set(NUMBER.findall(questions[index])) == numbers:
+                    self.hits += 1
+                    return float(scores[index]), questions[index], answers[index]
+            self.misses += 1
+            return None
+
+    def remove(self, schema: str, question: str) -> None:
+        """Drops a stored answer, e.g. one whose code stopped working."""
+        with self._lock:
+            entry = self._schemas.get(schema)
+            if entry is None or question not in entry[1]:
+                return
+            vectors, questions, answers = entry
+            index = questions.index(question)
+            entry[0] = np.delete(vectors, index, axis=0)
+            del questions[index], answers[index]
+            self.size -= 1
+
+    def stats(self) -> dict:
+        """Hit / miss counters, stored questions and schemas."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": self.size,
+                "schemas": len(self._schemas),
+            }
+
+
+# ------------------------------------ End ----------------------------------- #
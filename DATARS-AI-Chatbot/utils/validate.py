@@ -0,0 +1,152 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import ast
+import difflib
+import re
+
+import pandas as pd
+
+# ------------------------------- Configuration ------------------------------ #
+CODE_BLOCK = re.compile(r"```python\s*\n(.*?)```", re.DOTALL)
+
+# Top level modules generated code has no business importing.
+DISALLOWED_IMPORTS: set[str] = {
+    "os", "sys", "subprocess", "shutil", "socket", "pathlib", "importlib",
+    "ctypes", "multiprocessing", "threading", "signal", "pickle", "marshal",
+    "requests", "urllib", "http", "ftplib", "smtplib", "builtins",
+}
+DISALLOWED_CALLS: set[str] = {"eval", "exec", "compile", "open", "__import__", "input"}
+
+# DataFrame methods whose positional arguments / these keywords name columns.
+COLUMN_METHODS: dict[str, tuple[str, ...]] = {
+    "groupby": ("by",),
+    "sort_values": ("by",),
+    "set_index": ("keys",),
+    "drop_duplicates": ("subset",),
+    "dropna": ("subset",),
+    "value_counts": ("subset",),
+    "nlargest": ("columns",),
+    "nsmallest": ("columns",),
+    "pivot_table": ("values", "index", "columns"),
+    "pivot": ("index", "columns", "values"),
+    "melt": ("id_vars", "value_vars"),
+}
+# Positional arguments that are not columns (e.g. `nlargest(n, columns)`).
+SKIP_POSITIONAL: dict[str, int] = {"nlargest": 1, "nsmallest": 1}
+
+
+# ---------------------------------------------------------------------------- #
+#                              V A L I D A T I O N                             #
+# ---------------------------------------------------------------------------- #
+
+
+def extract_code(response: str) -> str | None:
+    """
+    Returns the first ```python block of a model answer, or None.
+    """
+    match = CODE_BLOCK.search(response)
+    return match.group(1) if match else None
+
+
+def _strings(node: ast.AST | None) -> list[str]:
+    """String constants of a node that is a string or a list / tuple of them."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return [value for element in node.elts for value in _strings(element)]
+    return []
+
+
+def _is_df(node: ast.AST) -> bool:
+    return isinstance(node, ast.Name) and node.id == "df"
+
+
+def _referenced_columns(tree: ast.AST) -> tuple[list[tuple[str, int]], set[str]]:
+    """
+    Columns the code reads from `df` (with their line) and the ones it creates,
+    e.g. `df['ratio'] = ...`, `df.assign(ratio=...)` or `rename(columns=...)`.
+    """
+    used: list[tuple[str, int]] = []
+    created: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Subscript) and _is_df(node.value):
+            names = _strings(node.slice)
+            if isinstance(node.ctx, ast.Store):
+                created.update(names)
+            else:
+                used.extend((name, node.lineno) for name in names)
+        elif isinstance(node, ast.Attribute) and _is_df(node.value):
+            # `df.region`: a column unless it is a DataFrame attribute
+            if isinstance(node.ctx, ast.Store):
+                created.add(node.attr)
+            elif not hasattr(pd.DataFrame, node.attr):
+                used.append((node.attr, node.lineno))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            method = node.func.attr
+            if method == "assign":
+                created.update(keyword.arg for keyword in node.keywords if keyword.arg)
+            elif method == "rename":
+                for keyword in node.keywords:
+                    if keyword.arg == "columns" and isinstance(keyword.value, ast.Dict):
+                        created.update(v for value in keyword.value.values for v in _strings(value))
+            elif method in COLUMN_METHODS and _is_df(node.func.value):
+                arguments = node.args[SKIP_POSITIONAL.get(method, 0):]
+                arguments += [k.value for k in node.keywords if k.arg in COLUMN_METHODS[method]]
+                used.extend((name, node.lineno) for arg in arguments for name in _strings(arg))
+    return used, created
+
+
+def validate_code(code: str, columns: list[str] | None = None) -> str | None:
+    """
+    Cheap static checks run before generated code is executed.
+
+    Args:
+        code (str): The generated Python code.
+        columns (list[str] | None, optional): Columns of the dataset, from
+            `get_context`. The column check is skipped when None.
+
+    Returns:
+        str | None: What is wrong with the code, or None if it looks runnable.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return f"SyntaxError: {e.msg} (line {e.lineno})"
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""]
+        else:
+            modules = []
+        for module in modules:
+            if module.split(".")[0] in DISALLOWED_IMPORTS:
+                return f"Import of '{module}' is not allowed (line {node.lineno})"
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in DISALLOWED_CALLS
+        ):
+            return f"Call to '{node.func.id}' is not allowed (line {node.lineno})"
+
+    if columns is None:
+        return None
+    # Once `df` is replaced (e.g. by an aggregate) its columns are unknown
+    if any(
+        isinstance(node, ast.Name) and node.id == "df" and isinstance(node.ctx, ast.Store)
+        for node in ast.walk(tree)
+    ):
+        return None
+    used, created = _referenced_columns(tree)
+    known = {str(column) for column in columns} | created
+    for name, line in used:
+        if name not in known:
+            close = difflib.get_close_matches(name, sorted(known), n=1)
+            hint = f", did you mean '{close[0]}'?" if close else ""
+            return f"KeyError: column '{name}' does not exist (line {line}){hint}"
+    return None
+
+
+# ------------------------------------ End ----------------------------------- #
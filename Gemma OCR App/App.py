@@ -1,10 +1,22 @@
 import streamlit as st
 from streamlit_extras.buy_me_a_coffee import button
+from utils.ocr_utils import PREPROCESS
+from utils.cache import get_cache
+from utils.metrics import get_metrics
+from utils.ollama_client import get_client, request_context
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 version: str = "0.0.1"
 logo_gif: str = "https://media1.tenor.com/m/d54XfQ2BGwcAAAAd/raccoon-circle-dance-round.gif"
 coffee_username: str = "astrayn"
 
+
+@st.cache_data(ttl=5, show_spinner=False)
+def queue_stats():
+    """Scheduler queue stats, fetched at most every 5 seconds instead of on every rerun"""
+    return get_client().scheduler_stats()
+
+
 #Page setup
 HomePage = st.Page(
     page="pages/Main.py",
@@ -13,6 +25,12 @@ HomePage = st.Page(
     default = True
 )
 
+BatchPage = st.Page(
+    page="pages/Batch.py",
+    icon="📚",
+    title = "Batch"
+)
+
 AboutPage = st.Page(
     page="pages/About.py",
     icon="👤",    
@@ -20,7 +38,7 @@ AboutPage = st.Page(
 )
 
 # Navigation Bar
-pg = st.navigation([HomePage, AboutPage])
+pg = st.navigation([HomePage, BatchPage, AboutPage])
 
 st.set_page_config(
     page_title="Gemma OCR App",
@@ -32,10 +50,40 @@ st.set_page_config(
 
 st.logo(logo_gif, size='large')
 with st.sidebar:
+    # Image preprocessing, read by every page through session state
+    with st.expander("Image preprocessing"):
+        resize = st.checkbox("Resize to model input", value=True)
+        st.session_state["preprocess"] = {
+            "exif": st.checkbox("Fix EXIF orientation", value=PREPROCESS["exif"]),
+            "max_side": PREPROCESS["max_side"] if resize else None,
+            "grayscale": st.checkbox("Grayscale", value=PREPROCESS["grayscale"]),
+            "binarize": st.checkbox("Binarize", value=PREPROCESS["binarize"]),
+            "deskew": st.checkbox("Deskew", value=PREPROCESS["deskew"]),
+            "format": st.selectbox("Encoder", ["JPEG", "WEBP", "PNG"]),
+            "quality": st.slider("Quality", 50, 100, PREPROCESS["quality"]),
+            # Tiling helps with large scans and dense small print
+            "tiling": st.selectbox(
+                "Tiling", [None, "layout", "grid"],
+                format_func=lambda mode: {None: "Off", "layout": "By layout", "grid": "Fixed grid"}[mode],
+            ),
+        }
+    cache = get_cache().stats()
+    st.caption(f"OCR cache: {cache['entries']} results ({cache['bytes'] / 1024:.0f} KB), {cache['hits']} hits")
     st.caption("Support me by clicking on this button 👇")
     button(username=coffee_username, floating=False, width=221)
+    queue = queue_stats()
+    if queue is not None:
+        st.caption(f"Ollama queue: {queue['waiting']} waiting, {queue['loaded_model']} loaded")
     st.caption(version)
+    # Timings and metrics, opened with ?debug=1 in the URL
+    if st.query_params.get("debug") == "1":
+        with st.expander("Debug"):
+            spans = list(get_metrics().spans)[::-1]
+            if spans:
+                st.dataframe(spans, hide_index=True)
+            st.code(get_metrics().render(), language="text")
 
 
-
-pg.run()
\ No newline at end of file
+# Requests of this session are interactive (the Batch page lowers its own) and shared fairly
+with request_context(priority="interactive", session=get_script_run_ctx().session_id):
+    pg.run()
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Compare OCR payload size and latency with and without image preprocessing.
+
+Usage:
+    python benchmark_preprocess.py photo1.jpg scan.png ... [--runs 3] [--no-ocr]
+"""
+import argparse
+import time
+from PIL import Image
+from utils.ocr_utils import image_to_base64, preprocess, ocr_image
+
+# Settings compared against each other, "original" is the old behaviour (full size PNG)
+SETTINGS = {
+    "original": {"exif": False, "max_side": None, "format": "PNG"},
+    "resized png": {"format": "PNG"},
+    "resized jpeg": {"format": "JPEG", "quality": 85},
+    "resized webp": {"format": "WEBP", "quality": 80},
+    "binarized png": {"binarize": True, "format": "PNG"},
+}
+
+
+def measure(image, options, runs, ocr):
+    """Payload size (bytes), encode time and OCR time (seconds, median of runs) for one setting"""
+    start = time.perf_counter()
+    payload = image_to_base64(preprocess(image, options), options)
+    encode = time.perf_counter() - start
+
+    latency = None
+    if ocr:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            # Uncached path: perform_ocr would answer every run after the first from the OCR cache
+            ocr_image(preprocess(image, options), options)
+            timings.append(time.perf_counter() - start)
+        latency = sorted(timings)[len(timings) // 2]
+    return len(payload), encode, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("images", nargs="+", help="Image files to benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="OCR runs per setting (median is reported)")
+    parser.add_argument("--no-ocr", action="store_true", help="Only measure payload size, don't call the model")
+    args = parser.parse_args()
+
+    print(f"{'image':<30} {'setting':<15} {'payload':>12} {'encode':>9} {'ocr':>9}")
+    for path in args.images:
+        image = Image.open(path)
+        image.load()
+        for name, options in SETTINGS.items():
+            size, encode, latency = measure(image, options, args.runs, not args.no_ocr)
+            ocr = f"{latency:8.2f}s" if latency is not None else f"{'-':>9}"
+            print(f"{path[-30:]:<30} {name:<15} {size / 1024:10.1f}KB {encode * 1000:7.1f}ms {ocr}")
+
+
+if __name__ == "__main__":
+    main()
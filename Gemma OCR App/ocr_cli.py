@@ -0,0 +1,221 @@
+"""
+Headless OCR runner for bulk jobs.
+
+Usage:
+    python ocr_cli.py scans/ "inbox/**/*.jpg" report.pdf --workers 4
+    python ocr_cli.py scans/ --jsonl results.jsonl --manifest scans.manifest.jsonl
+
+Markdown is written next to every input as <name>.<ext>.md (or into --out-dir,
+keeping the paths below each input directory), or appended to a JSONL file with
+--jsonl. Finished files are recorded in the manifest, so an
+interrupted job started again with the same manifest skips them.
+"""
+import argparse
+import contextvars
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PIL import Image
+from utils.ocr_utils import IMAGE_TYPES, stream_ocr
+from utils.ollama_client import request_context
+from utils.pdf_utils import page_count, page_text, render_page, join_pages
+
+FILE_TYPES = IMAGE_TYPES + ("pdf",)
+
+
+class Interrupted(Exception):
+    """Raised by files that finish after Ctrl-C, once the outputs are being closed"""
+
+
+def input_root(pattern):
+    """The directory a file found through `pattern` is named relative to"""
+    if os.path.isdir(pattern):
+        return pattern
+    parts = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or (os.sep if pattern.startswith(os.sep) else ".")
+
+
+def find_files(inputs, recursive=False):
+    """
+    Expand files, directories and glob patterns into OCR-able files, sorted, as
+    {absolute path: path relative to its input}
+    """
+    files = {}
+    for pattern in inputs:
+        root = input_root(pattern)
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*") if recursive else os.path.join(pattern, "*")
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isfile(path) and path.lower().endswith(FILE_TYPES):
+                files.setdefault(os.path.abspath(path), os.path.relpath(path, root))
+    return dict(sorted(files.items()))
+
+
+def load_manifest(path):
+    """Paths already done according to the manifest"""
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as manifest:
+            for line in manifest:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be cut short if the previous run was killed mid-write
+                    continue
+                if entry.get("status") == "ok":
+                    done.add(entry["path"])
+    return done
+
+
+def ocr_file(path, options, dpi):
+    """Markdown for one image or PDF, raising on failure"""
+    if path.lower().endswith(".pdf"):
+        with open(path, "rb") as file:
+            data = file.read()
+        pages = []
+        for number in range(page_count(data)):
+            # Same as pdf_utils.ocr_page, but errors are raised instead of written into the text
+            text = page_text(data, number)
+            if text is None:
+                text = "".join(stream_ocr(render_page(data, number, dpi), options))
+            pages.append(text)
+        return join_pages(pages)
+    with Image.open(path) as image:
+        image.load()
+        return "".join(stream_ocr(image, options))
+
+
+def markdown_path(path, relative, out_dir=None):
+    """Where the Markdown for `path` is written, keeping its suffix so foo.jpg and foo.pdf don't collide"""
+    return os.path.join(out_dir, relative) + ".md" if out_dir else path + ".md"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="Image / PDF files, directories or glob patterns")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Also walk sub directories of directory inputs")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Files processed at the same time")
+    parser.add_argument("--out-dir", help="Write the .md files here instead of next to the inputs")
+    parser.add_argument("--jsonl", help="Append {path, text} records to this JSONL file instead of writing .md files")
+    parser.add_argument("--manifest", default="ocr_manifest.jsonl", help="Manifest of finished files, used to resume")
+    parser.add_argument("--dpi", type=int, default=150, help="Render DPI for PDF pages")
+    parser.add_argument("--tiling", choices=["grid", "layout"], help="OCR large images as tiles")
+    parser.add_argument("--no-resize", action="store_true", help="Send images at their original size")
+    args = parser.parse_args()
+
+    files = find_files(args.inputs, args.recursive)
+    if args.out_dir and not args.jsonl:
+        # The same relative path under two inputs would overwrite each other's Markdown
+        targets = {}
+        for path, relative in files.items():
+            target = os.path.normcase(os.path.abspath(markdown_path(path, relative, args.out_dir)))
+            if target in targets:
+                parser.error(f"{targets[target]} and {path} would both be written to {target}")
+            targets[target] = path
+    done = load_manifest(args.manifest)
+    todo = [path for path in files if path not in done]
+    print(f"{len(files)} files found, {len(files) - len(todo)} already done, {len(todo)} to process", file=sys.stderr)
+    if not todo:
+        return 0
+
+    options = {"tiling": args.tiling}
+    if args.no_resize:
+        options["max_side"] = None
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    lock = threading.Lock()
+    stopping = threading.Event()
+    manifest = open(args.manifest, "a", encoding="utf-8")
+    results = open(args.jsonl, "a", encoding="utf-8") if args.jsonl else None
+    ok = failed = 0
+    start = time.perf_counter()
+
+    def process(path):
+        began = time.perf_counter()
+        text = ocr_file(path, options, args.dpi)
+        if stopping.is_set():
+            # Not written or recorded, the file is redone on resume
+            raise Interrupted(path)
+        if results is None:
+            target = markdown_path(path, files[path], args.out_dir)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "w", encoding="utf-8") as output:
+                output.write(text)
+        else:
+            with lock:
+                results.write(json.dumps({"path": path, "text": text}, ensure_ascii=False) + "\n")
+                results.flush()
+        return time.perf_counter() - began
+
+    def record(future, path):
+        nonlocal ok, failed
+        entry = {"path": path, "status": "ok"}
+        try:
+            entry["seconds"] = round(future.result(), 3)
+            ok += 1
+        except Exception as e:
+            entry.update(status="error", error=str(e))
+            failed += 1
+        # Record each file as soon as it is done so a crash loses at most the files in flight
+        with lock:
+            manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            manifest.flush()
+
+        finished = ok + failed
+        elapsed = time.perf_counter() - start
+        rate = finished / elapsed
+        eta = (len(todo) - finished) / rate if rate else 0
+        status = "ok" if entry["status"] == "ok" else f"FAILED: {entry['error']}"
+        print(
+            f"[{finished}/{len(todo)}] {rate:.2f} files/s, eta {eta:.0f}s, {failed} failed - "
+            f"{os.path.basename(path)} {status}",
+            file=sys.stderr,
+        )
+
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    futures = {}
+    recorded = set()
+    try:
+        # Bulk work: interactive requests from the apps go first at the scheduler
+        with request_context(priority="batch", session="ocr-cli", concurrency=args.workers):
+            for path in todo:
+                futures[executor.submit(contextvars.copy_context().run, process, path)] = path
+        for future in as_completed(futures):
+            record(future, futures[future])
+            recorded.add(future)
+    except KeyboardInterrupt:
+        stopping.set()
+        # Drop the queued files instead of running them all before exiting
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Keep the files that finished but weren't recorded yet
+        for future, path in futures.items():
+            if future.done() and not future.cancelled() and future not in recorded:
+                if not isinstance(future.exception(), Interrupted):
+                    record(future, path)
+        print("Interrupted, run again with the same manifest to resume", file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown(wait=False)
+        manifest.close()
+        if results is not None:
+            results.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Done: {ok} ok, {failed} failed in {elapsed:.1f}s ({(ok + failed) / elapsed:.2f} files/s)",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import streamlit as st
+from utils.ocr_utils import count_batch, load_batch, ocr_batch, export_markdown, export_zip
+from utils.ollama_client import request_context
+
+
+st.title("📚 Batch OCR")
+st.markdown("""
+Upload many images (or zip files of images) and extract the text from all of them at once.
+Results show up as soon as each image is done.
+""")
+
+# File uploader
+uploaded_files = st.file_uploader(
+    "Choose image or zip files", type=["png", "jpg", "jpeg", "zip"], accept_multiple_files=True
+)
+concurrency = st.slider("Images processed at the same time", 1, 8, 4)
+
+if uploaded_files:
+    if st.button("Extract All", type="primary"):
+        # Images are decoded as they are submitted, not all up front
+        total = count_batch(uploaded_files)
+        results = [None] * total
+        progress = st.progress(0.0, text=f"0 / {total} images done")
+
+        # Show every result the moment it comes back; batch requests yield to interactive ones
+        with request_context(priority="batch"):
+            batch = ocr_batch(load_batch(uploaded_files), concurrency, st.session_state.get("preprocess"))
+            for done, (index, name, text) in enumerate(batch, start=1):
+                results[index] = (name, text)
+                progress.progress(done / total, text=f"{done} / {total} images done")
+                with st.expander(name):
+                    st.markdown(text)
+
+        # Store results (in upload order) in session state
+        st.session_state["batch_results"] = results
+        st.success("Batch finished!")
+        st.rerun()
+
+# Display results if available
+if st.session_state.get("batch_results"):
+    results = st.session_state["batch_results"]
+    st.subheader(f"Extracted Text ({len(results)} images)")
+
+    col_md, col_zip = st.columns(2)
+    with col_md:
+        st.download_button(
+            label="💾 Download as one .md",
+            data=export_markdown(results),
+            file_name="extracted_text.md",
+            mime="text/markdown",
+        )
+    with col_zip:
+        st.download_button(
+            label="🗜️ Download as .zip",
+            data=export_zip(results),
+            file_name="extracted_text.zip",
+            mime="application/zip",
+        )
+
+    for name, text in results:
+        with st.expander(name):
+            st.markdown(text)
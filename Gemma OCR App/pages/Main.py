@@ -1,37 +1,80 @@
 import streamlit as st
 import pyperclip
 from PIL import Image
-from utils.ocr_utils import perform_ocr
+from utils.ocr_utils import stream_ocr
+from utils.pdf_utils import page_count, render_page, ocr_pdf, join_pages
 
 
 st.title("📝 Gemma OCR App")
 st.markdown("""
 This app uses Gemma 3 to perform OCR (Optical Character Recognition) on images and returns the text in Markdown format.
-Upload an image to get started!
+Upload an image or a PDF to get started!
 """)
 
 # File uploader
-uploaded_file = st.file_uploader("Choose an image file", type=["png", "jpg", "jpeg"])
+uploaded_file = st.file_uploader("Choose an image or PDF file", type=["png", "jpg", "jpeg", "pdf"])
 
 if uploaded_file is not None:
+    is_pdf = uploaded_file.name.lower().endswith(".pdf")
+
     # Create columns for layout
     col1, col2 = st.columns([1,4])
 
     with col1:
-        st.subheader("Uploaded Image")
-        # Display image
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Uploaded Image")
+        if is_pdf:
+            st.subheader("Uploaded PDF")
+            pdf_data = uploaded_file.getvalue()
+            pages = page_count(pdf_data)
+            dpi = st.select_slider("Render DPI", options=[72, 100, 150, 200, 300], value=150)
+            # Only the first page is rendered up front, the rest are rendered while extracting
+            st.image(render_page(pdf_data, 0, 72), caption=f"Page 1 of {pages}")
+        else:
+            st.subheader("Uploaded Image")
+            # Display image
+            image = Image.open(uploaded_file)
+            st.image(image, caption="Uploaded Image")
 
         # Process button
-        if st.button("Extract Text", type="primary"):
-            with st.spinner("Processing image..."):
-                # Perform OCR
-                markdown_text = perform_ocr(image)
+        extract = st.button("Extract Text", type="primary")
+
+    if extract and not is_pdf:
+        with col2:
+            st.subheader("Extracted Text")
+            stats = {}
+            # Render the Markdown as the model writes it
+            try:
+                markdown_text = st.write_stream(stream_ocr(image, st.session_state.get("preprocess"), stats))
+            except Exception as e:
+                markdown_text = f"Error performing OCR: {str(e)}"
+
+            # Store result in session state
+            st.session_state["markdown_result"] = markdown_text
+            st.session_state["ocr_stats"] = stats
+            # Rerun so the result is shown with the copy / download buttons below
+            st.rerun()
 
-                # Store result in session state
-                st.session_state["markdown_result"] = markdown_text
-                st.success("Text extracted successfully!")
+    if extract and is_pdf:
+        with col2:
+            st.subheader("Extracted Text")
+            progress = st.progress(0.0, text=f"0 / {pages} pages done")
+            # One placeholder per page keeps the output in page order while pages finish in any order
+            slots = [st.empty() for _ in range(pages)]
+            results = [None] * pages
+            skipped = 0
+
+            pdf_pages = ocr_pdf(pdf_data, dpi, options=st.session_state.get("preprocess"))
+            for done, (number, text, source) in enumerate(pdf_pages, start=1):
+                results[number] = text
+                skipped += source == "text layer"
+                slots[number].markdown(f"**Page {number + 1}** · _{source}_\n\n{text}")
+                progress.progress(done / pages, text=f"{done} / {pages} pages done")
+
+            # Store result in session state
+            st.session_state["markdown_result"] = join_pages(results)
+            st.session_state.pop("ocr_stats", None)
+            st.toast(f"Text extracted successfully! {skipped} of {pages} pages used their text layer.")
+            # Rerun so the combined result is shown with the copy / download buttons below
+            st.rerun()
 
     with col2:
         st.subheader("Extracted Text")
@@ -41,6 +84,16 @@ if uploaded_file is not None:
             # Display markdown
             st.markdown(st.session_state["markdown_result"])
 
+            # Timing of the last extraction
+            stats = st.session_state.get("ocr_stats")
+            if stats and stats["cached"]:
+                st.caption("⚡ From cache")
+            elif stats and "tokens" in stats:
+                st.caption(
+                    f"First token after {stats['ttft']:.2f}s · {stats['tokens']} tokens"
+                    f" · {stats['tokens_per_sec']:.1f} tokens/s · {stats['total']:.1f}s total"
+                )
+
             # Buttons for copy and download
             col_copy, col_download = st.columns(2)
 
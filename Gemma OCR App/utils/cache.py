@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Shared by every session and kept across restarts
+CACHE_DIR = os.environ.get("GEMMA_OCR_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", ".cache"))
+max_bytes = 256 * 1024 * 1024
+
+
+class OcrCache:
+    """SQLite cache of OCR results, the least recently used results are dropped above `max_bytes`"""
+
+    def __init__(self, path, max_bytes=max_bytes):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        """Cached text for `key`, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, text):
+        """Store `text` under `key` and evict the oldest results while over the size limit"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, text, len(text.encode("utf-8")), time.time()),
+            )
+            self._conn.execute(
+                """DELETE FROM results WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS total FROM results
+                    ) WHERE total > ?
+                )""",
+                (self.max_bytes,),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        """Hit / miss counters of this process plus the number and size of stored results"""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The process wide OCR cache, created on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OcrCache(os.path.join(CACHE_DIR, "ocr.sqlite3"))
+        return _cache
@@ -1,36 +1,371 @@
 import base64
-import ollama
+import contextvars
+import difflib
+import hashlib
+import itertools
+import json
+import os
+import time
+import zipfile
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils.ollama_client import get_client, request_context
+from utils.cache import get_cache
+from utils.metrics import RATE_BUCKETS, get_metrics, span
 from io import BytesIO
+from PIL import Image, ImageOps
 
-def image_to_base64(image):
-    """Convert a PIL Image to base64 string"""
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
+IMAGE_TYPES = ("png", "jpg", "jpeg")
+
+MODEL = "gemma3"
+PROMPT = """You are an OCR assistant. Please extract all readable text from the image input and return the result in clean, well-formatted Markdown.
+Extract all text possible do not change anything write down all text in the image, also create tables, underlines wherever necessary"""
+# Bump whenever PROMPT changes so cached results from the old prompt are not reused
+PROMPT_VERSION = 1
+
+# Gemma 3's vision encoder sees 896x896, anything bigger is downsampled by the server anyway
+MODEL_INPUT_SIZE = 896
+
+# Default preprocessing applied before an image is sent to the model
+PREPROCESS = {
+    "exif": True,             # rotate according to the EXIF orientation tag
+    "max_side": MODEL_INPUT_SIZE,  # longest side in pixels, None keeps the original size
+    "grayscale": False,
+    "binarize": False,        # black / white with Otsu's threshold (implies grayscale)
+    "deskew": False,          # straighten text rotated by up to `max_skew` degrees
+    "format": "JPEG",         # PNG (lossless), JPEG or WEBP
+    "quality": 85,            # JPEG / WebP quality
+    "tiling": None,           # None, "grid" or "layout" (cut tiles at blank rows / columns)
+}
+max_skew = 5.0
+
+# Tiling: tile side and overlap in pixels of the original image
+tile_size = 1024
+tile_overlap = 96
+# How far (pixels) a layout cut may move from the grid line to land on whitespace
+layout_search = 160
+
+
+def otsu_threshold(gray):
+    """Threshold (0-255) that best splits a grayscale image into foreground and background"""
+    histogram = np.bincount(np.asarray(gray).ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(histogram)
+    mean = np.cumsum(histogram * np.arange(256))
+    background, foreground = weight, weight[-1] - weight
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * background - mean * weight[-1]) ** 2 / (background * foreground)
+    return int(np.nanargmax(between))
+
+
+def skew_angle(gray, limit=max_skew, step=0.5):
+    """Angle that makes the text lines horizontal, found by maximizing the row profile variance"""
+    # A small copy is enough to find the angle and keeps the search fast
+    small = gray.copy()
+    small.thumbnail((600, 600))
+    ink = ImageOps.invert(small)
+    best, best_score = 0.0, -1.0
+    for angle in np.arange(-limit, limit + step, step):
+        rows = np.asarray(ink.rotate(angle, resample=Image.BILINEAR)).sum(axis=1, dtype=np.float64)
+        score = np.var(rows)
+        if score > best_score:
+            best, best_score = float(angle), score
+    return best
+
+
+def preprocess(image, options=None):
+    """Apply the preprocessing steps in `options` (defaults to PREPROCESS) to a PIL Image"""
+    options = {**PREPROCESS, **(options or {})}
+    if options["exif"]:
+        image = ImageOps.exif_transpose(image)
+    if options["max_side"] and max(image.size) > options["max_side"]:
+        image = image.copy()
+        image.thumbnail((options["max_side"], options["max_side"]), Image.LANCZOS)
+    if options["grayscale"] or options["binarize"] or options["deskew"]:
+        gray = image.convert("L")
+        if options["deskew"]:
+            angle = skew_angle(gray)
+            if angle:
+                gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+        if options["binarize"]:
+            threshold = otsu_threshold(gray)
+            gray = gray.point(lambda value: 255 if value > threshold else 0)
+        image = gray if options["grayscale"] or options["binarize"] else gray.convert("RGB")
+    return image
+
+
+def image_to_base64(image, options=None):
+    """Convert a PIL Image to base64 string, encoded with the format / quality in `options`"""
+    options = {**PREPROCESS, **(options or {})}
+    with span("image_encode", format=options["format"]):
+        buffered = BytesIO()
+        if options["format"] == "PNG":
+            image.save(buffered, format="PNG")
+        else:
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(buffered, format=options["format"], quality=options["quality"])
+        img_str = base64.b64encode(buffered.getvalue()).decode()
+    get_metrics().inc("image_payload_bytes_total", len(img_str), format=options["format"])
     return img_str
 
-def perform_ocr(image):
-    """Perform OCR on the given image using Gemma 3 model"""
+def ocr_messages(image, options=None):
+    """Chat messages asking Gemma 3 to OCR one (preprocessed) image"""
+    # Convert image to base64
+    img_base64 = image_to_base64(image, options)
+    return [
+        {
+            'role': 'user',
+            'content': PROMPT,
+            'images': [img_base64]
+        }
+    ]
+
+
+def ocr_image(image, options=None):
+    """Send one (preprocessed) image to Gemma 3 and return the Markdown it produced"""
+    response = get_client().chat(MODEL, ocr_messages(image, options))
+
+    # Extract the markdown text from response
+    return response['message']['content']
+
+
+def cache_key(image, options):
+    """SHA-256 of the image pixels plus the model, prompt version and OCR options"""
+    digest = hashlib.sha256()
+    digest.update(f"{MODEL}\0{PROMPT_VERSION}\0{json.dumps(options, sort_keys=True)}\0".encode())
+    # Hash the decoded pixels so the same picture matches whatever file format it came in
+    digest.update(f"{image.mode}\0{image.size}\0".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def record_ocr(stats):
+    """Put the stats of one stream_ocr call into the metrics"""
+    metrics = get_metrics()
+    labels = {"cache": "hit" if stats["cached"] else "miss"}
+    metrics.observe("ocr_seconds", stats["total"], **labels)
+    if "ttft" in stats:
+        metrics.observe("ocr_ttft_seconds", stats["ttft"], **labels)
+    if "tokens" in stats:
+        metrics.observe("ocr_tokens_per_second", stats["tokens_per_sec"], buckets=RATE_BUCKETS)
+    metrics.spans.append({
+        "time": time.strftime("%H:%M:%S"), "span": "ocr", "seconds": round(stats["total"], 4),
+        "ttft": round(stats.get("ttft", 0.0), 4), "tokens": stats.get("tokens"), **labels,
+    })
+
+
+def stream_ocr(image, options=None, stats=None):
+    """
+    Yield the Markdown for an image piece by piece as the model writes it, then cache it.
+    `stats` (a dict) is filled with the time to first token, token count and tokens / second.
+    """
+    stats = {} if stats is None else stats
+    start = time.perf_counter()
+    options = {**PREPROCESS, **(options or {})}
+    if options["exif"]:
+        image = ImageOps.exif_transpose(image)
+    key = cache_key(image, options)
+    options = {**options, "exif": False}
+
+    text = get_cache().get(key)
+    stats["cached"] = text is not None
+    if text is not None:
+        stats["ttft"] = stats["total"] = time.perf_counter() - start
+        record_ocr(stats)
+        yield text
+        return
+
+    if options["tiling"]:
+        # Tiles are OCR'd in parallel, so there is only the stitched text to show
+        text = perform_tiled_ocr(image, options)
+        stats["ttft"] = time.perf_counter() - start
+        yield text
+    else:
+        # Shrink / clean up the image before sending it
+        messages = ocr_messages(preprocess(image, options), options)
+        pieces, tokens, generating = [], 0, 0.0
+        for chunk in get_client().chat_stream(MODEL, messages):
+            if not pieces:
+                stats["ttft"] = time.perf_counter() - start
+            content = chunk['message']['content']
+            pieces.append(content)
+            tokens += 1
+            if chunk.get('done'):
+                # Ollama reports the exact count and generation time (ns) in the last chunk
+                tokens = chunk.get('eval_count') or tokens
+                generating = (chunk.get('eval_duration') or 0) / 1e9
+            yield content
+        text = "".join(pieces)
+        generating = generating or time.perf_counter() - start - stats.get("ttft", 0)
+        stats["tokens"] = tokens
+        stats["tokens_per_sec"] = tokens / generating if generating else 0.0
+
+    stats["total"] = time.perf_counter() - start
+    record_ocr(stats)
+    get_cache().set(key, text)
+
+
+def perform_ocr(image, options=None):
+    """Perform OCR on the given image using Gemma 3 model, reusing cached results"""
     try:
-        # Convert image to base64
-        img_base64 = image_to_base64(image)
-        
-        # Prepare the prompt
-        prompt = """You are an OCR assistant. Please extract all readable text from the image input and return the result in clean, well-formatted Markdown.
-        Extract all text possible do not change anything write down all text in the image, also create tables, underlines wherever necessary"""
-        
-        # Call Gemma 3 model
-        response = ollama.chat(model='gemma3', messages=[
-            {
-                'role': 'user',
-                'content': prompt,
-                'images': [img_base64]
-                
-            }
-        ])
-        
-        # Extract the markdown text from response
-        return response['message']['content']
-    
+        with span("perform_ocr"):
+            return "".join(stream_ocr(image, options))
+
     except Exception as e:
         return f"Error performing OCR: {str(e)}"
+
+
+def blank_lines(gray, axis):
+    """Boolean mask of the rows (axis=1) or columns (axis=0) that contain no ink"""
+    ink = np.asarray(gray) <= otsu_threshold(gray)
+    return ink.sum(axis=axis) <= max(1, ink.shape[axis] // 500)
+
+
+def cut_points(length, blank=None):
+    """Start / end of every tile along one side, cutting at whitespace when `blank` is given"""
+    if length <= tile_size:
+        return [(0, length)]
+    spans, start = [], 0
+    # The last tile may be a bit bigger rather than leaving a thin sliver
+    while length - start > tile_size * 5 // 4:
+        end = start + tile_size
+        if blank is not None:
+            # Nearest blank line to the grid line, looking back so tiles never grow
+            window = np.flatnonzero(blank[max(start + tile_size // 2, end - layout_search):end])
+            if len(window):
+                end = max(start + tile_size // 2, end - layout_search) + int(window[-1])
+                spans.append((start, end))
+                start = end
+                continue
+        # No whitespace found: overlap the tiles so no line is cut in half in both
+        spans.append((start, end))
+        start = end - tile_overlap
+    spans.append((start, length))
+    return spans
+
+
+def tile_boxes(image, mode="grid"):
+    """Tile boxes (left, top, right, bottom) of an image in reading order (row by row)"""
+    width, height = image.size
+    if mode == "layout":
+        gray = image.convert("L")
+        rows = cut_points(height, blank_lines(gray, axis=1))
+        columns = cut_points(width, blank_lines(gray, axis=0))
+    else:
+        rows, columns = cut_points(height), cut_points(width)
+    return [(left, top, right, bottom) for top, bottom in rows for left, right in columns]
+
+
+def same_line(a, b):
+    """True if two OCR'd lines are the same text (allowing small OCR differences)"""
+    a, b = " ".join(a.split()).lower(), " ".join(b.split()).lower()
+    return a == b or (len(a) > 8 and difflib.SequenceMatcher(None, a, b).ratio() > 0.9)
+
+
+def stitch(texts, max_overlap=8):
+    """Join tile texts, dropping lines repeated at the seam because the tiles overlapped"""
+    lines = []
+    for text in texts:
+        new = text.strip().splitlines()
+        # Longest run of lines at the end of the text so far that the next tile starts with
+        for size in range(min(max_overlap, len(lines), len(new)), 0, -1):
+            if all(same_line(a, b) for a, b in zip(lines[-size:], new[:size])):
+                new = new[size:]
+                break
+        if lines and new and lines[-1].strip():
+            lines.append("")
+        lines.extend(new)
+    return "\n".join(lines)
+
+
+def perform_tiled_ocr(image, options, concurrency=4):
+    """OCR an (already EXIF rotated) image as overlapping tiles in parallel and stitch the texts back together"""
+    # Tiles without any ink (margins, gaps between columns) are not worth a request
+    boxes = [
+        box for box in tile_boxes(image, options["tiling"])
+        if image.crop(box).convert("L").getextrema()[0] < 200
+    ]
+    # The tiles' requests may all be in flight at once (see `request_context`)
+    with request_context(concurrency=concurrency):
+        context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        texts = executor.map(
+            lambda box: context.copy().run(ocr_image, preprocess(image.crop(box), options), options), boxes
+        )
+        return stitch(list(texts))
+
+
+def zip_images(archive):
+    """Names of the images inside an open zip file, in order"""
+    return [
+        member for member in sorted(archive.namelist())
+        if member.lower().endswith(IMAGE_TYPES) and not member.startswith("__MACOSX")
+    ]
+
+
+def count_batch(files):
+    """Number of images `load_batch` yields, read from the zip directories only"""
+    count = 0
+    for file in files:
+        if file.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(file) as archive:
+                count += len(zip_images(archive))
+        else:
+            count += 1
+    return count
+
+
+def load_batch(files):
+    """Yield (name, PIL Image) for every uploaded image and every image inside uploaded zips.
+    Zip members are read and decoded one at a time, as the generator is advanced."""
+    for file in files:
+        if file.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(file) as archive:
+                for member in zip_images(archive):
+                    image = Image.open(BytesIO(archive.read(member)))
+                    image.load()
+                    yield member, image
+        else:
+            yield file.name, Image.open(file)
+
+
+def ocr_batch(images, concurrency=4, options=None):
+    """Run OCR on (name, image) pairs concurrently, yield (index, name, text) as each one finishes.
+    `images` is consumed lazily: the next image is only taken when a worker is free."""
+    # The pool bounds this batch, and its requests get a model limit of the same size
+    with request_context(concurrency=concurrency):
+        context = contextvars.copy_context()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    images = enumerate(images)
+    futures = {}
+
+    def submit(count):
+        for index, (name, image) in itertools.islice(images, count):
+            # A copy of the context per job keeps the scheduler tags of the caller
+            futures[executor.submit(context.copy().run, perform_ocr, image, options)] = (index, name)
+
+    try:
+        submit(concurrency)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = futures.pop(future)
+                submit(1)
+                yield index, name, future.result()
+    finally:
+        # Closed early (Stop, rerun, an error): drop the queued images instead of waiting for them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def export_markdown(results):
+    """Combine (name, text) results into one Markdown document"""
+    return "\n\n---\n\n".join(f"## {name}\n\n{text}" for name, text in results)
+
+
+def export_zip(results):
+    """Pack (name, text) results into a zip with one .md file per image"""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, text in results:
+            archive.writestr(os.path.splitext(name)[0] + ".md", text)
+    return buffer.getvalue()
@@ -0,0 +1,291 @@
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import asyncio
+import contextlib
+import contextvars
+import os
+import queue
+import random
+import threading
+from concurrent.futures import Future
+from typing import Any, Generator, Iterator
+
+import httpx
+import ollama
+
+# ------------------------------- Configuration ------------------------------ #
+# This module is kept identical in both apps: each app is deployed and run on
+# its own from its folder.
+HOST: str = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+if "://" not in HOST:
+    HOST = f"http://{HOST}"
+request_timeout: float = 300.0
+connect_timeout: float = 5.0
+health_timeout: float = 2.0
+max_connections: int = 16
+max_retries: int = 3
+backoff_seconds: float = 0.5
+# Requests allowed in flight per model, anything above waits in the client.
+# `request_context(concurrency=n)` gives the requests of a block their own limit.
+model_concurrency: dict[str, int] = {"default": 2}
+
+# Scheduler headers (see ollama_scheduler.py) of the requests made in the current context
+_tags: contextvars.ContextVar[dict[str, str]] = contextvars.ContextVar("ollama_tags", default={})
+# Per-model limit of the requests made in the current context (None: `model_concurrency`)
+_concurrency: contextvars.ContextVar[int | None] = contextvars.ContextVar(
+    "ollama_concurrency", default=None
+)
+
+
+# ---------------------------------------------------------------------------- #
+#                                   C L I E N T                                #
+# ---------------------------------------------------------------------------- #
+
+
+def _retryable(error: Exception) -> bool:
+    # Never reached the server (ollama raises ConnectionError for httpx.ConnectError)
+    if isinstance(error, (ConnectionError, httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    # A timed out generation would only run, and time out, once more
+    if isinstance(error, httpx.TimeoutException):
+        return False
+    # Dropped / reset connections, e.g. a stale keep-alive connection
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+async def _backoff(attempt: int) -> None:
+    await asyncio.sleep(backoff_seconds * 2**attempt * (1 + random.random()))
+
+
+async def _add_tags(request: httpx.Request) -> None:
+    request.headers.update(_tags.get())
+
+
+@contextlib.contextmanager
+def request_context(
+    priority: str | None = None,
+    session: str | None = None,
+    concurrency: int | None = None,
+) -> Iterator[None]:
+    """
+    Tags every request started inside the block with the X-Priority / X-Session
+    headers read by `ollama_scheduler.py` (plain Ollama ignores them).
+    Worker threads don't inherit the tags; submit through
+    `contextvars.copy_context().run` to keep them.
+
+    Args:
+        priority (str | None, optional): "interactive" or "batch".
+        session (str | None, optional): Id used to share the server fairly between sessions.
+        concurrency (int | None, optional): Requests per model allowed in flight
+            for the block (shared by every block asking for the same number)
+            instead of `model_concurrency`, e.g. the size of a batch's thread
+            pool. Other callers keep the default limit.
+    """
+    tags = dict(_tags.get())
+    if priority is not None:
+        tags["X-Priority"] = priority
+    if session is not None:
+        tags["X-Session"] = session
+    token = _tags.set(tags)
+    limit = _concurrency.set(concurrency if concurrency is not None else _concurrency.get())
+    try:
+        yield
+    finally:
+        _concurrency.reset(limit)
+        _tags.reset(token)
+
+
+class OllamaClient:
+    """
+    Process wide Ollama client.
+
+    All requests run on one background asyncio loop through a pooled
+    (keep-alive) `ollama.AsyncClient`, with timeouts, retries with exponential
+    backoff on connection errors / 5xx, and a concurrency limit per model.
+    The blocking methods are thin wrappers for Streamlit scripts; `submit_*`
+    return futures so callers can fan out many requests at once.
+    """
+
+    def __init__(self, host: str = HOST) -> None:
+        self.host = host
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name="ollama-client", daemon=True
+        ).start()
+        self._limits: dict[tuple[str, int], asyncio.Semaphore] = {}
+        self._client, self._http = self._run(self._connect()).result()
+
+    async def _connect(self) -> tuple[ollama.AsyncClient, httpx.AsyncClient]:
+        limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+        timeout = httpx.Timeout(request_timeout, connect=connect_timeout)
+        client = ollama.AsyncClient(
+            self.host,
+            timeout=timeout,
+            limits=limits,
+            event_hooks={"request": [_add_tags]},
+        )
+        http = httpx.AsyncClient(base_url=self.host, timeout=health_timeout)
+        return client, http
+
+    def _run(self, coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _semaphore(self, model: str, limit: int | None) -> asyncio.Semaphore:
+        if limit is None:
+            limit = model_concurrency.get(model, model_concurrency["default"])
+        if (model, limit) not in self._limits:
+            self._limits[model, limit] = asyncio.Semaphore(limit)
+        return self._limits[model, limit]
+
+    async def _call(
+        self, model: str, method: str, tags: dict, limit: int | None, **kwargs
+    ) -> Any:
+        # Runs as its own task, so this only tags this request
+        _tags.set(tags)
+        async with self._semaphore(model, limit):
+            for attempt in range(max_retries + 1):
+                try:
+                    return await getattr(self._client, method)(model=model, **kwargs)
+                except Exception as e:
+                    if attempt == max_retries or not _retryable(e):
+                        raise
+                    await _backoff(attempt)
+
+    # ------------------------------- Requests ------------------------------- #
+
+    def submit_chat(self, model: str, messages: list[dict], **kwargs) -> Future:
+        """Starts an `ollama.chat` request and returns its future."""
+        call = self._call(model, "chat", _tags.get(), _concurrency.get(), messages=messages, **kwargs)
+        return self._run(call)
+
+    def submit_generate(self, model: str, prompt: str, **kwargs) -> Future:
+        """Starts an `ollama.generate` request and returns its future."""
+        call = self._call(model, "generate", _tags.get(), _concurrency.get(), prompt=prompt, **kwargs)
+        return self._run(call)
+
+    def submit_embed(self, model: str, input: str | list[str], **kwargs) -> Future:
+        """Starts an `ollama.embed` request and returns its future."""
+        call = self._call(model, "embed", _tags.get(), _concurrency.get(), input=input, **kwargs)
+        return self._run(call)
+
+    def chat(self, model: str, messages: list[dict], **kwargs) -> Any:
+        """Blocking `ollama.chat`."""
+        return self.submit_chat(model, messages, **kwargs).result()
+
+    def generate(self, model: str, prompt: str, **kwargs) -> Any:
+        """Blocking `ollama.generate`."""
+        return self.submit_generate(model, prompt, **kwargs).result()
+
+    def embed(self, model: str, input: str | list[str], **kwargs) -> Any:
+        """Blocking `ollama.embed`."""
+        return self.submit_embed(model, input, **kwargs).result()
+
+    def chat_stream(
+        self, model: str, messages: list[dict], **kwargs
+    ) -> Generator[Any, None, None]:
+        """
+        Streams `ollama.chat` chunks into a plain generator.
+
+        Failures before the first chunk are retried like any other request;
+        once chunks are flowing an error is raised to the caller. Closing the
+        generator cancels the request.
+        """
+        chunks: queue.Queue = queue.Queue()
+        done = object()
+        tags, limit = _tags.get(), _concurrency.get()
+
+        async def pump() -> None:
+            _tags.set(tags)
+            async with self._semaphore(model, limit):
+                for attempt in range(max_retries + 1):
+                    started = False
+                    try:
+                        stream = await self._client.chat(
+                            model=model, messages=messages, stream=True, **kwargs
+                        )
+                        async for chunk in stream:
+                            started = True
+                            chunks.put(chunk)
+                        break
+                    except Exception as e:
+                        if started or attempt == max_retries or not _retryable(e):
+                            chunks.put(e)
+                            break
+                        await _backoff(attempt)
+            chunks.put(done)
+
+        future = self._run(pump())
+        try:
+            while (chunk := chunks.get()) is not done:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            future.cancel()
+
+    # -------------------------------- Health -------------------------------- #
+
+    def scheduler_stats(self) -> dict | None:
+        """Queue stats of `ollama_scheduler.py`, or None when talking to Ollama directly."""
+
+        async def stats() -> dict | None:
+            try:
+                response = await self._http.get("/scheduler/stats")
+                if response.status_code != 200:
+                    return None
+                stats = response.json()
+                return stats if isinstance(stats, dict) and "waiting" in stats else None
+            except (httpx.HTTPError, ValueError):
+                return None
+
+        return self._run(stats()).result()
+
+    def is_running(self) -> bool:
+        """True if the Ollama server answers on its root URL."""
+
+        async def ping() -> bool:
+            try:
+                response = await self._http.get("/")
+                return response.status_code == 200
+            except httpx.HTTPError:
+                return False
+
+        return self._run(ping()).result()
+
+    def list_models(self) -> list[str]:
+        """Names of the models pulled on the server."""
+
+        async def tags() -> list[str]:
+            response = await self._client.list()
+            return [model.model for model in response.models]
+
+        return self._run(tags()).result()
+
+
+# ---------------------------------------------------------------------------- #
+
+_client: OllamaClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    """
+    Returns the shared client, creating it on first use.
+    Returns:
+        OllamaClient: The process wide client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
+
+
+# ------------------------------------ End ----------------------------------- #
@@ -0,0 +1,62 @@
+import contextvars
+import pymupdf
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PIL import Image
+from utils.ocr_utils import perform_ocr
+from utils.ollama_client import request_context
+
+# Pages whose text layer has at least this many characters are not sent to the model
+MIN_TEXT_CHARS = 20
+
+
+def page_count(data):
+    """Number of pages in a PDF given as bytes"""
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        return document.page_count
+
+
+def page_text(data, number):
+    """Embedded text layer of a page, or None if the page is scanned / has too little text"""
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        text = document[number].get_text("text").strip()
+    return text if len(text) >= MIN_TEXT_CHARS else None
+
+
+def render_page(data, number, dpi=150):
+    """Rasterize one page to a PIL Image at the given DPI"""
+    # Every call opens its own document, PyMuPDF documents can't be shared between threads
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        pixmap = document[number].get_pixmap(dpi=dpi)
+    return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def ocr_page(data, number, dpi=150, options=None):
+    """Text of one page, from its text layer when it has one, otherwise from the model"""
+    text = page_text(data, number)
+    if text is not None:
+        return text, "text layer"
+    return perform_ocr(render_page(data, number, dpi), options), "ocr"
+
+
+def ocr_pdf(data, dpi=150, concurrency=4, options=None):
+    """OCR every page of a PDF in parallel, yield (page index, text, source) as each page finishes"""
+    # Pages are rendered inside the workers, so only `concurrency` pages are in memory at once
+    with request_context(concurrency=concurrency):
+        context = contextvars.copy_context()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = {
+            executor.submit(context.copy().run, ocr_page, data, number, dpi, options): number
+            for number in range(page_count(data))
+        }
+        for future in as_completed(futures):
+            text, source = future.result()
+            yield futures[future], text, source
+    finally:
+        # Closed early (Stop, rerun, an error): drop the queued pages instead of waiting for them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def join_pages(pages):
+    """Combine page texts (in page order) into one Markdown document"""
+    return "\n\n---\n\n".join(f"<!-- Page {number} -->\n\n{text}" for number, text in enumerate(pages, start=1))
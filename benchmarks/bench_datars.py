@@ -0,0 +1,128 @@
+"""
+DATARS benchmark for one dataset size: CSV ingest, dataset store, context,
+question suggestions, the chat stream and executing the generated code.
+
+    python benchmarks/bench_datars.py --rows 100000 --repeat 5
+
+Meant to be run by `run.py`, which starts the mock Ollama server and sets
+OLLAMA_HOST / DATARS_CACHE_DIR; prints one JSON line per case.
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import measure, quiet_streamlit, use_app
+
+use_app("DATARS-AI-Chatbot")
+# The apps' code runs outside `streamlit run` here. Silenced before it is imported,
+# in this process and in the sandbox workers (spawn re-imports this file)
+quiet_streamlit()
+
+import streamlit as st  # noqa: E402
+from utils.datasets import write_arrow  # noqa: E402
+from utils.functions import (  # noqa: E402
+    execute,
+    get_artifact_store,
+    get_context,
+    get_dataset_registry,
+    get_ollama_stream,
+    get_profile,
+    get_questions,
+    get_response_cache,
+)
+from utils.ingest import CsvIngest  # noqa: E402
+
+# ------------------------------- Configuration ------------------------------ #
+QUESTION = "What is the average value per category?"
+# CSV parsing above this size takes minutes and says little more
+max_csv_rows = 1_000_000
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Sales like data: an id, a low cardinality category, two numbers and a date."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "id": np.arange(rows),
+            "category": rng.choice(["north", "south", "east", "west", "online"], rows),
+            "value": rng.gamma(2.0, 50.0, rows).round(2),
+            "quantity": rng.integers(1, 20, rows),
+            "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, rows), "D"),
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    rows, repeat = args.rows, args.repeat
+    df = synthetic_frame(rows)
+
+    if rows <= max_csv_rows:
+        data = df.to_csv(index=False).encode()
+
+        def ingest() -> None:
+            job = CsvIngest(io.BytesIO(data), len(data)).start()
+            job.done.wait()
+            if job.error is not None:
+                raise job.error
+
+        measure("datars", "csv_ingest", ingest, max(repeat // 2, 1), items=rows, rows=rows, bytes=len(data))
+
+    key = f"bench-{rows}"
+    registry = get_dataset_registry()
+    measure(
+        "datars", "dataset_store", lambda: registry.get_or_load(key, f"{key}.csv", lambda: write_arrow(df, key)),
+        1, items=rows, rows=rows,
+    )
+    dataset = registry.get(key)
+    st.session_state["df"] = dataset.view()
+    st.session_state["fingerprint"] = key
+    st.session_state["file_name"] = f"{key}.csv"
+
+    def clear_context() -> None:
+        get_context.clear()
+        get_profile.clear()
+
+    def context() -> None:
+        st.session_state["context"] = get_context(key, f"{key}.csv", st.session_state["df"])
+
+    measure("datars", "get_context", context, repeat, items=rows, setup=clear_context, rows=rows)
+    measure("datars", "get_questions", lambda: get_questions(st.session_state["context"]), repeat,
+            setup=get_response_cache().clear, rows=rows)
+
+    # Chat answer: time to first token and the whole stream, without the response cache
+    answers = []
+
+    def chat() -> dict:
+        start = time.perf_counter()
+        pieces = []
+        for piece in get_ollama_stream(QUESTION):
+            if not pieces:
+                ttft = time.perf_counter() - start
+            pieces.append(piece)
+        answers.append("".join(pieces))
+        return {"ttft_s": ttft, "chunks": len(pieces)}
+
+    measure("datars", "chat_stream", chat, repeat, setup=get_response_cache().clear, rows=rows)
+
+    # Generated code: first run in a sandbox worker, then replayed from the artifact store
+    answer = answers[-1]
+
+    def run() -> None:
+        error, _ = execute(answer)
+        if error is not None:
+            raise RuntimeError(error)
+
+    run()  # starts the worker pool and loads the frame in a worker
+    measure("datars", "execute", run, repeat, items=rows, setup=get_artifact_store.clear, rows=rows)
+    measure("datars", "execute_replay", run, repeat, rows=rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Text fixer benchmark for one file size: chunking, a single `fix_text` call,
+fixing the whole file chunk by chunk, and re-fixing it after a one line edit.
+
+    python benchmarks/bench_fixer.py --kb 100 --repeat 3
+
+Meant to be run by `run.py`, which starts the mock Ollama server and sets
+OLLAMA_HOST; prints one JSON line per case.
+"""
+import argparse
+import random
+
+from common import measure, quiet_streamlit, use_app
+
+use_app(".")
+# The apps' code runs outside `streamlit run` here, silenced before it is imported
+quiet_streamlit()
+
+from format_file import ChunkStore, fix_chunks, fix_text, merge_chunks, split_chunks  # noqa: E402
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog invoice report quarterly revenue "
+    "teh recieve seperate occured definately their there because however"
+).split()
+
+
+def synthetic_text(kb: int, seed: int = 0) -> str:
+    """OCR-like text with typos, stray spaces and paragraphs, about `kb` KiB long."""
+    rng = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < kb * 1024:
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize()
+            + rng.choice([".", ".", "!", "?"])
+            for _ in range(rng.randint(2, 8))
+        ]
+        paragraph = ("  " if rng.random() < 0.2 else " ").join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def fix_file(text: str, store: ChunkStore) -> dict:
+    chunks, separators = split_chunks(text)
+    fixed = [None] * len(chunks)
+    reused = 0
+    for index, chunk, from_store in fix_chunks(chunks, store):
+        fixed[index] = chunk
+        reused += from_store
+    merge_chunks(fixed, separators)
+    return {"chunks": len(chunks), "reused": reused}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--kb", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    kb, repeat = args.kb, args.repeat
+    text = synthetic_text(kb)
+    chunks, _ = split_chunks(text)
+
+    measure("fixer", "split_chunks", lambda: split_chunks(text), repeat, items=kb, kb=kb, chunks=len(chunks))
+    measure("fixer", "fix_text", lambda: fix_text(chunks[0]), repeat, kb=kb)
+
+    measure("fixer", "fix_file", lambda: fix_file(text, ChunkStore()), repeat, items=kb, kb=kb)
+
+    # Re-upload with one sentence added in the middle: only the chunks around it are sent again
+    store = ChunkStore()
+    fix_file(text, store)
+    middle = text.index(". ", len(text) // 2) + 2
+    edited = text[:middle] + "An added sentence. " + text[middle:]
+    measure("fixer", "fix_file_edited", lambda: fix_file(edited, store), 1, items=kb, kb=kb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Gemma OCR benchmark for one image size: a cold `perform_ocr` (preprocessing,
+upload and the streamed answer), a cached one, and a batch of distinct images.
+
+    python benchmarks/bench_ocr.py --size 1920x1080 --repeat 5
+
+Meant to be run by `run.py`, which starts the mock Ollama server and sets
+OLLAMA_HOST / GEMMA_OCR_CACHE_DIR; prints one JSON line per case.
+"""
+import argparse
+
+from PIL import Image, ImageDraw
+
+from common import measure, quiet_streamlit, use_app
+
+use_app("Gemma OCR App")
+# The apps' code runs outside `streamlit run` here, silenced before it is imported
+quiet_streamlit()
+
+from utils.cache import get_cache  # noqa: E402
+from utils.ocr_utils import image_to_base64, ocr_batch, perform_ocr, preprocess  # noqa: E402
+
+
+def synthetic_page(width: int, height: int, seed: int = 0) -> Image.Image:
+    """A scanned-page like image: dark text lines on an off-white background."""
+    image = Image.new("RGB", (width, height), (245, 243, 238))
+    draw = ImageDraw.Draw(image)
+    line = max(height // 40, 12)
+    for row, y in enumerate(range(line, height - line, line)):
+        text = f"Line {row} of page {seed}: invoice item {row * 7 % 97}, amount {row * 3.5:.2f}"
+        draw.text((line, y), text * max(width // 600, 1), fill=(20, 20, 20))
+    return image
+
+
+def check(text: str) -> None:
+    # perform_ocr reports failures as text, a benchmark must not time those
+    if text.startswith("Error performing OCR"):
+        raise RuntimeError(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="1920x1080", help="WIDTHxHEIGHT")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=16, help="Images in the batch case")
+    args = parser.parse_args()
+    width, height = map(int, args.size.split("x"))
+    image = synthetic_page(width, height)
+    size = args.size
+
+    measure("ocr", "encode", lambda: image_to_base64(preprocess(image)), args.repeat, size=size)
+    measure("ocr", "perform_ocr", lambda: check(perform_ocr(image)), args.repeat,
+            setup=get_cache().clear, size=size)
+    measure("ocr", "perform_ocr_cached", lambda: check(perform_ocr(image)), args.repeat, size=size)
+
+    corpus = [(f"page_{i}.png", synthetic_page(width, height, seed=i)) for i in range(args.batch)]
+
+    def batch() -> None:
+        for _, _, text in ocr_batch(corpus):
+            check(text)
+
+    measure("ocr", "ocr_batch", batch, 1, items=len(corpus), setup=get_cache().clear,
+            size=size, images=len(corpus))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Timing / memory helpers shared by the benchmark suites."""
+import json
+import os
+import resource
+import sys
+import time
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_app(folder: str) -> None:
+    """Makes the modules of the app in `folder` (its `utils` package) importable."""
+    sys.path.insert(0, os.path.join(ROOT, folder))
+
+
+def quiet_streamlit() -> None:
+    """Silences the "missing ScriptRunContext" warnings of running the apps' code bare."""
+    from streamlit import config
+    from streamlit.logger import set_log_level
+
+    # Reading the config resets the log level, so read it first
+    config.get_config_options()
+    set_log_level("error")
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Linear interpolated percentile (q in 0..100)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process (Linux reports KB, macOS bytes)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(
+    suite: str,
+    case: str,
+    function: Callable[[], object],
+    repeat: int,
+    items: float = 1,
+    setup: Callable[[], object] | None = None,
+    **extra,
+) -> dict:
+    """
+    Runs `function` `repeat` times (calling `setup` untimed before each run) and
+    prints one JSON line: p50 / p95 / mean latency, throughput in items per
+    second and the peak RSS so far. If `function` returns a dict of numbers
+    (e.g. the time to first token), their p50 / p95 are reported as well.
+    """
+    timings = []
+    samples: dict[str, list[float]] = {}
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        values = function()
+        timings.append(time.perf_counter() - start)
+        for name, value in (values if isinstance(values, dict) else {}).items():
+            samples.setdefault(name, []).append(value)
+    total = sum(timings)
+    result = {
+        "suite": suite,
+        "case": case,
+        "repeat": repeat,
+        "p50_s": round(percentile(timings, 50), 6),
+        "p95_s": round(percentile(timings, 95), 6),
+        "mean_s": round(total / repeat, 6),
+        "throughput_per_s": round(items * repeat / total, 3) if total else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        **extra,
+    }
+    for name, values in samples.items():
+        result[f"{name}_p50"] = round(percentile(values, 50), 6)
+        result[f"{name}_p95"] = round(percentile(values, 95), 6)
+    print(json.dumps(result), flush=True)
+    return result
@@ -0,0 +1,174 @@
+"""
+Stand-in Ollama server for benchmarks: canned answers, streamed with a fixed,
+configurable latency so runs are reproducible without a GPU or a real model.
+
+    python benchmarks/mock_ollama.py --port 11500 --first-token-ms 200 --token-ms 20
+
+Answers are picked from the request: chats with images get OCR Markdown,
+qwen chats get pandas / plotly code, prompts asking for questions get a
+question list and text-fixer prompts get their text back.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ------------------------------- Configuration ------------------------------ #
+MODELS = ["qwen2.5-coder:7b", "gemma3:latest", "nomic-embed-text:latest"]
+CODE_ANSWER = """```python
+import plotly.express as px
+result = df.groupby('category', observed=True)['value'].mean().reset_index()
+st.write('Average value per category')
+st.plotly_chart(px.bar(result, x='category', y='value'))
+```"""
+QUESTIONS_ANSWER = str([f"Question {i} about the value per category?" for i in range(15)])
+OCR_ANSWER = "\n".join(
+    ["# Invoice 2024-001", "", "| Item | Qty | Price |", "|---|---|---|"]
+    + [f"| Widget {i} | {i % 7 + 1} | {i * 3.5:.2f} |" for i in range(40)]
+    + ["", "Thank you for your business."]
+)
+EMBEDDING_SIZE = 768
+
+
+def answer(model: str, messages: list[dict] | None, prompt: str | None) -> str:
+    """The canned answer for a request."""
+    if messages is not None:
+        if any(message.get("images") for message in messages):
+            return OCR_ANSWER
+        prompt = messages[-1].get("content", "")
+    prompt = prompt or ""
+    if "(((" in prompt:
+        match = re.search(r"\(\(\((.*)\)\)\)", prompt, re.DOTALL)
+        return match.group(1).strip() if match else ""
+    if "questions" in prompt.lower():
+        return QUESTIONS_ANSWER
+    if model.startswith("qwen"):
+        return CODE_ANSWER
+    return "" if not prompt else "OK."
+
+
+def tokens(text: str) -> list[str]:
+    """Word sized tokens, whitespace included, so joining them gives the text back."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def embedding(text: str) -> list[float]:
+    """Deterministic unit vector derived from the text."""
+    seed = sum(text.encode()) or 1
+    values = [((seed * (i + 1) * 2654435761) % 1000) / 1000 - 0.5 for i in range(EMBEDDING_SIZE)]
+    norm = sum(v * v for v in values) ** 0.5
+    return [v / norm for v in values]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    first_token: float = 0.2
+    per_token: float = 0.02
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        if self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/tags":
+            self._json({"models": [{"model": m, "name": m} for m in MODELS]})
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        model = request.get("model", "")
+        if self.path in ("/api/embed", "/api/embeddings"):
+            inputs = request.get("input", request.get("prompt", ""))
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            time.sleep(self.first_token)
+            if self.path == "/api/embed":
+                self._json({"model": model, "embeddings": [embedding(text) for text in inputs]})
+            else:
+                self._json({"embedding": embedding(inputs[0])})
+            return
+        if self.path not in ("/api/chat", "/api/generate"):
+            self._json({"error": "not found"}, 404)
+            return
+
+        chat = self.path == "/api/chat"
+        text = answer(model, request.get("messages") if chat else None, request.get("prompt"))
+        pieces = tokens(text)
+        duration = int(self.per_token * len(pieces) * 1e9)
+
+        def message(content: str, done: bool) -> dict:
+            payload = {"model": model, "created_at": "2024-01-01T00:00:00Z", "done": done}
+            if chat:
+                payload["message"] = {"role": "assistant", "content": content}
+            else:
+                payload["response"] = content
+            if done:
+                payload.update(done_reason="stop", eval_count=len(pieces), eval_duration=duration)
+            return payload
+
+        if not request.get("stream", True):
+            time.sleep(self.first_token + self.per_token * len(pieces))
+            self._json(message(text, True))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.first_token)
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(self.per_token)
+            self._chunk(message(piece, False))
+        self._chunk(message("", True))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, payload: dict) -> None:
+        line = json.dumps(payload).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+
+def serve(port: int, first_token_ms: float = 200, token_ms: float = 20) -> ThreadingHTTPServer:
+    """Starts the mock server in a daemon thread and returns it."""
+    handler = type(
+        "Handler", (MockHandler,), {"first_token": first_token_ms / 1000, "per_token": token_ms / 1000}
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Ollama server with deterministic latency")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--first-token-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=20)
+    args = parser.parse_args()
+    serve(args.port, args.first_token_ms, args.token_ms)
+    print(f"Mock Ollama on http://127.0.0.1:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
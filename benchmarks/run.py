@@ -0,0 +1,114 @@
+"""
+Runs the benchmark suites against the mock Ollama server and writes the
+results as JSON.
+
+    python benchmarks/run.py                          # default sizes
+    python benchmarks/run.py --suites datars --rows 1000 1000000 10000000
+    python benchmarks/run.py --token-ms 20 --out results.json
+
+Every suite / size runs in its own process, so the reported peak RSS belongs
+to that case alone, with fresh cache directories. Compare two result files
+to spot regressions; the mock latency is part of the output so runs with
+different settings are not mixed up.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import mock_ollama
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ------------------------------- Configuration ------------------------------ #
+# 10M rows skips the CSV ingest case (see `max_csv_rows` in bench_datars.py)
+DEFAULT_ROWS = [1_000, 100_000, 1_000_000, 10_000_000]
+DEFAULT_IMAGES = ["640x480", "1920x1080", "4000x3000"]
+DEFAULT_TEXT_KB = [10, 100, 1000]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def jobs(args) -> list[tuple[str, list[str]]]:
+    """(label, command line) of every suite / size to run."""
+    commands = {
+        "datars": [("bench_datars.py", ["--rows", str(rows)]) for rows in args.rows],
+        "ocr": [("bench_ocr.py", ["--size", size]) for size in args.images],
+        "fixer": [("bench_fixer.py", ["--kb", str(kb)]) for kb in args.text_kb],
+    }
+    return [
+        (f"{suite} {' '.join(options)}", [sys.executable, os.path.join(HERE, script), *options,
+                                          "--repeat", str(args.repeat)])
+        for suite in args.suites
+        for script, options in commands[suite]
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--suites", nargs="+", choices=["datars", "ocr", "fixer"], default=["datars", "ocr", "fixer"])
+    parser.add_argument("--rows", nargs="+", type=int, default=DEFAULT_ROWS, help="Dataset sizes (rows)")
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGES, help="Image sizes (WIDTHxHEIGHT)")
+    parser.add_argument("--text-kb", nargs="+", type=int, default=DEFAULT_TEXT_KB, help="Text file sizes (KiB)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case")
+    parser.add_argument("--first-token-ms", type=float, default=50, help="Mock latency before the first token")
+    parser.add_argument("--token-ms", type=float, default=2, help="Mock latency per token")
+    parser.add_argument("--out", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    port = free_port()
+    server = mock_ollama.serve(port, args.first_token_ms, args.token_ms)
+    results, failures = [], []
+    started = time.time()
+    for label, command in jobs(args):
+        with tempfile.TemporaryDirectory(prefix="bench_") as cache:
+            env = {
+                **os.environ,
+                "OLLAMA_HOST": f"http://127.0.0.1:{port}",
+                "DATARS_CACHE_DIR": os.path.join(cache, "datars"),
+                "GEMMA_OCR_CACHE_DIR": os.path.join(cache, "ocr"),
+                "PYTHONPATH": HERE,
+            }
+            print(f"== {label}", file=sys.stderr, flush=True)
+            process = subprocess.run(command, env=env, cwd=cache, stdout=subprocess.PIPE, text=True)
+        for line in process.stdout.splitlines():
+            if line.startswith("{"):
+                result = json.loads(line)
+                results.append(result)
+                print(
+                    f"   {result['case']:<20} p50 {result['p50_s']:9.4f}s  p95 {result['p95_s']:9.4f}s  "
+                    f"{result['throughput_per_s'] or 0:12.2f}/s  rss {result['peak_rss_mb']:8.1f} MB",
+                    file=sys.stderr,
+                )
+        if process.returncode != 0:
+            failures.append(label)
+    server.shutdown()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(time.time() - started, 1),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "mock": {"first_token_ms": args.first_token_ms, "token_ms": args.token_ms},
+        "repeat": args.repeat,
+        "failed": failures,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,39 @@
+import codecs
+import difflib
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
 import ollama 
+from charset_normalizer import from_bytes
+
+# One pooled (keep-alive) client for every fix instead of the module default,
+# with a timeout so a stuck model call doesn't hang the page forever.
+# The headers are read by ollama_scheduler.py when it sits in front of Ollama.
+client = ollama.Client(timeout=300, headers={"X-Priority": "interactive", "X-Session": "text-fixer"})
+
+# Long files are fixed in chunks of about this many tokens (prompt and answer both fit in num_ctx)
+chunk_tokens = 1000
+# Sentences repeated at the start of the next chunk so the model sees some context at the seam
+overlap_sentences = 1
+num_ctx = 4096
+workers = 4
+# Fixed chunks kept for re-uploads; bump PROMPT_VERSION when the prompt in fix_text changes
+store_entries = 5000
+PROMPT_VERSION = 1
+# Uploads are decoded in blocks; only the first preview_kb are put in the page
+read_block = 1024 * 1024
+detect_sample = 64 * 1024
+preview_kb = 64
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Boundaries tried in order until every piece fits the budget: paragraphs, sentences,
+# lines, words (OCR output often has neither blank lines nor punctuation)
+SPLIT_PATTERNS = (r"\n\s*\n", r"(?<=[.!?])\s+", r"\n", r"\s+")
 
 def fix_text(text):
 
@@ -10,10 +44,202 @@ def fix_text(text):
     Here is the text:
      ((( {text} )))"""
 
-    work = ollama.generate(model =model , prompt= prompt)
+    work = client.generate(model =model , prompt= prompt, options={"num_ctx": num_ctx})
     fixed_text = work.get("response", "")
     return fixed_text
 
+def count_tokens(text):
+    # Rough estimate (~4 characters per token), good enough for sizing chunks
+    return len(text) // 4 + 1
+
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_END.split(text) if sentence.strip()]
+
+def split_pieces(text, pattern):
+    """Split text on `pattern`, keeping every separator attached to the piece before it"""
+    parts = re.split(f"({pattern})", text)
+    return ["".join(parts[i:i + 2]) for i in range(0, len(parts), 2) if "".join(parts[i:i + 2])]
+
+def split_to_budget(text, budget, patterns=SPLIT_PATTERNS):
+    """Split text into pieces of at most `budget` tokens on the coarsest boundaries that get there.
+    A single word over budget is cut into fixed size slices."""
+    if count_tokens(text) <= budget:
+        return [text]
+    if not patterns:
+        size = budget * 4
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    pieces = []
+    for piece in split_pieces(text, patterns[0]):
+        pieces.extend(split_to_budget(piece, budget, patterns[1:]))
+    return pieces
+
+def overlap_text(chunk, overlap, budget):
+    """The last `overlap` sentences of a chunk, repeated at the start of the next one.
+    Nothing when they are long (text without punctuation), so chunks stay within budget."""
+    tail = " ".join(split_sentences(chunk)[-overlap:]) if overlap else ""
+    return tail + " " if tail and count_tokens(tail) <= budget // 4 else ""
+
+def is_boundary(piece, budget):
+    """Whether a chunk should end after `piece`, decided by its content alone.
+    Chance grows with the piece size, so chunks average about half the budget."""
+    digest = hashlib.sha256(" ".join(piece.split()).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2**32 < count_tokens(piece) / (budget / 2)
+
+def split_chunks(text, budget=chunk_tokens, overlap=overlap_sentences):
+    """Split text into chunks of about `budget` tokens on paragraph boundaries, falling back to
+    sentences, lines and words (see `split_to_budget`).
+    Each chunk after the first starts with the last `overlap` sentences of the previous one.
+    Returns the chunks and the whitespace that followed each one in the original text."""
+    # Paragraphs, or whatever boundary still fits when a paragraph is too big on its own
+    pieces = split_to_budget(text, budget)
+
+    chunks, current, carried = [], "", ""
+    for piece in pieces:
+        if current.strip() and count_tokens(carried + current + piece) > budget:
+            chunks.append(carried + current)
+            carried = overlap_text(current, overlap, budget)
+            current = ""
+        current += piece
+        if is_boundary(piece, budget) and count_tokens(current) >= budget // 4:
+            # Content defined cut: an edit only moves the boundaries of the chunks around it
+            chunks.append(carried + current)
+            carried = overlap_text(current, overlap, budget)
+            current = ""
+    if current.strip():
+        chunks.append(carried + current)
+    separators = [chunk[len(chunk.rstrip()):] for chunk in chunks]
+    return [chunk.strip() for chunk in chunks], separators
+
+def same_sentence(a, b):
+    a, b = " ".join(a.split()).lower(), " ".join(b.split()).lower()
+    return a == b or difflib.SequenceMatcher(None, a, b).ratio() > 0.85
+
+def drop_overlap(previous, current, max_sentences=overlap_sentences):
+    """Remove the sentences at the start of `current` that repeat the end of `previous`"""
+    tail, head = split_sentences(previous), split_sentences(current.lstrip())
+    # Smallest match first: neighbouring sentences in repetitive text can look alike
+    for size in range(1, min(max_sentences, len(tail), len(head)) + 1):
+        if all(same_sentence(a, b) for a, b in zip(tail[-size:], head[:size])):
+            # Cut right after the repeated sentences, keeping the original spacing of the rest
+            cut = current.lstrip()
+            for sentence in head[:size]:
+                cut = cut[cut.index(sentence) + len(sentence):]
+            return cut.lstrip()
+    return current
+
+def merge_chunks(fixed, separators, overlap=overlap_sentences):
+    """Join the fixed chunks in order, de-duplicating the overlap at each seam"""
+    merged = fixed[0].strip() if fixed else ""
+    for chunk, separator in zip(fixed[1:], separators):
+        rest = drop_overlap(merged, chunk.strip(), overlap)
+        if rest:
+            # Paragraph and line breaks stay, a sentence or word break becomes a space
+            joint = "\n\n" if separator.count("\n") > 1 else "\n" if "\n" in separator else " "
+            merged += joint + rest
+    return merged
+
+class ChunkStore:
+    """LRU map of chunk hash -> fixed chunk, shared by every session"""
+
+    def __init__(self, max_entries=store_entries):
+        self.max_entries = max_entries
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(chunk):
+        return hashlib.sha256(f"{PROMPT_VERSION}\0{chunk}".encode("utf-8")).hexdigest()
+
+    def get(self, chunk):
+        with self._lock:
+            key = self.key(chunk)
+            if key in self._chunks:
+                self._chunks.move_to_end(key)
+            return self._chunks.get(key)
+
+    def set(self, chunk, fixed):
+        with self._lock:
+            self._chunks[self.key(chunk)] = fixed
+            while len(self._chunks) > self.max_entries:
+                self._chunks.popitem(last=False)
+
+@st.cache_resource
+def get_chunk_store():
+    return ChunkStore()
+
+def fix_chunks(chunks, store=None, workers=workers):
+    """Fix chunks concurrently, yielding (index, fixed text, reused) as each one finishes.
+    Chunks already in `store` are not sent to the model again."""
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {}
+        for index, chunk in enumerate(chunks):
+            fixed = store.get(chunk) if store is not None else None
+            if fixed is not None:
+                yield index, fixed, True
+            else:
+                futures[executor.submit(fix_text, chunk)] = index
+        for future in as_completed(futures):
+            index = futures[future]
+            if store is not None:
+                store.set(chunks[index], future.result())
+            yield index, future.result(), False
+    finally:
+        # Closed early (Stop, rerun, an error): drop the queued chunks instead of waiting for them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def detect_encoding(sample):
+    """Encoding of a file from its first bytes: BOM, then UTF-8, then charset_normalizer's guess"""
+    for bom, encoding in ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # Not final: the sample may end in the middle of a multi byte character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        match = from_bytes(sample).best()
+        return match.encoding if match is not None else "latin-1"
+
+def read_upload(file):
+    """Decode an uploaded file block by block, without copying the whole upload first.
+    Returns the text and the detected encoding."""
+    file.seek(0)
+    encoding = detect_encoding(file.read(detect_sample))
+    file.seek(0)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parts = []
+    while block := file.read(read_block):
+        parts.append(decoder.decode(block))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), encoding
+
+def preview(text, label):
+    """Read only text area with the start of a (possibly huge) text"""
+    limit = preview_kb * 1024
+    st.text_area(label, text[:limit], height=200, disabled=True, label_visibility="collapsed")
+    if len(text) > limit:
+        st.caption(f"Showing the first {preview_kb} KB of {len(text) / 1024:,.0f} KB.")
+
+def write_atomic(path, text):
+    """Write to a temp file next to `path` and rename it into place, so readers never see half a file"""
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temporary, path)
+    return path
+
+@st.cache_resource
+def get_writer():
+    # Saving happens off the script thread so a big file doesn't hold up the render
+    return ThreadPoolExecutor(max_workers=2)
+
+def session_dir():
+    """Temp directory of this session, removed when the session state is dropped"""
+    if "output_dir" not in st.session_state:
+        st.session_state["output_dir"] = tempfile.TemporaryDirectory(prefix="text_fixer_")
+    return st.session_state["output_dir"].name
+
 def main():
     st.title("Simple Text Fixer")
     
@@ -21,33 +247,64 @@ def main():
     uploaded_file = st.file_uploader("Upload a text file", type=["txt"])
     
     if uploaded_file is not None:
-        # Read file content
-        text_content = uploaded_file.getvalue().decode("utf-8")
-        
+        # Read file content, once per upload
+        if st.session_state.get("upload_id") != uploaded_file.file_id:
+            st.session_state["upload"] = read_upload(uploaded_file)
+            st.session_state["upload_id"] = uploaded_file.file_id
+        text_content, encoding = st.session_state["upload"]
+
         # Display original text
         st.subheader("Original Text:")
-        st.text_area("", text_content, height=200, disabled=True)
-        
+        preview(text_content, "Original text")
+        st.caption(f"Encoding: {encoding}")
+
         # Fix text button - just one button
         if st.button("Fix Text"):
-            # Process the text
-            fixed_text = fix_text(text_content)
+            # Process the text chunk by chunk, showing each one as soon as it is fixed
+            chunks, separators = split_chunks(text_content)
+            progress = st.progress(0.0, text=f"0 / {len(chunks)} chunks fixed")
+            with st.expander("Chunks", expanded=len(chunks) > 1):
+                slots = [st.empty() for _ in chunks]
+            fixed = [None] * len(chunks)
+            reused = 0
+            # Chunks unchanged since an earlier upload come straight from the store
+            for done, (index, chunk, from_store) in enumerate(fix_chunks(chunks, get_chunk_store()), start=1):
+                fixed[index] = chunk
+                reused += from_store
+                slots[index].text(chunk)
+                progress.progress(done / len(chunks), text=f"{done} / {len(chunks)} chunks fixed")
+            fixed_text = merge_chunks(fixed, separators)
+            if reused:
+                st.info(f"{reused} of {len(chunks)} chunks were unchanged and reused from an earlier fix.")
             
+            # Save the file in the background while the result is rendered
+            output_filename = f"fixed_{uploaded_file.name}"
+            saved = get_writer().submit(write_atomic, os.path.join(session_dir(), output_filename), fixed_text)
+
             # Display the fixed text
             st.subheader("Fixed Text:")
-            st.text_area("", fixed_text, height=200)
-            
-            # Save the file
-            output_filename = f"fixed_{uploaded_file.name}"
-            with open(output_filename, "w") as f:
-                f.write(fixed_text)
-            
+            preview(fixed_text, "Fixed text")
+
+            # What the model changed
+            with st.expander("Changes"):
+                diff = difflib.unified_diff(
+                    text_content.splitlines(), fixed_text.splitlines(),
+                    "original", "fixed", lineterm="", n=1,
+                )
+                st.code("\n".join(diff)[: preview_kb * 1024] or "No changes", language="diff")
+
+            def read_saved():
+                # Only runs when the button is clicked, straight from the saved file
+                with open(saved.result(), "rb") as f:
+                    return f.read()
+
             st.success(f"Fixed text saved as: {output_filename}")
             st.download_button(
                 label="Download Fixed Text",
-                data=fixed_text,
+                data=read_saved,
                 file_name=output_filename,
-                mime="text/plain"
+                mime="text/plain",
+                on_click="ignore",
             )
 
 if __name__ == "__main__":
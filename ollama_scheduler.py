@@ -0,0 +1,366 @@
+"""
+Admission queue in front of a single Ollama server, shared by every app.
+
+Run it next to Ollama and point the apps at it instead:
+
+    python ollama_scheduler.py --port 11435 --upstream http://localhost:11434
+    OLLAMA_HOST=http://localhost:11435 streamlit run App.py
+
+Model requests (chat / generate / embed) wait here until one of `slots` upstream
+slots is free. The next request is picked by, in order:
+    1. priority class, from the X-Priority header ("interactive" before "batch"),
+    2. model affinity: requests for the model that is already loaded go first,
+       so a mix of models doesn't reload them back and forth, unless a request
+       for another model has waited `max_affinity_wait` seconds or
+       `affinity_limit` requests in a row went to the loaded model,
+    3. fair share between sessions (X-Session header): the session served
+       longest ago goes first, then arrival order.
+Requests whose client disconnects while waiting (a closed page, a client side
+timeout) leave the queue and are never sent upstream.
+Everything else is passed through untouched. GET /scheduler/stats returns the
+queue depth, waits and model swaps as JSON.
+"""
+# ---------------------------------------------------------------------------- #
+#                                    IMPORTS                                   #
+# ---------------------------------------------------------------------------- #
+import argparse
+import http.client
+import json
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import urlsplit
+
+# ------------------------------- Configuration ------------------------------ #
+PRIORITIES: dict[str, int] = {"interactive": 0, "batch": 1}
+SCHEDULED_PATHS: set[str] = {"/api/chat", "/api/generate", "/api/embed", "/api/embeddings"}
+HOP_HEADERS: set[str] = {
+    "connection", "keep-alive", "transfer-encoding", "content-length", "host",
+    "x-priority", "x-session",
+}
+default_slots: int = 1
+affinity_limit: int = 8
+max_affinity_wait: float = 30.0
+upstream_timeout: float = 600.0
+# How often a waiting request checks that its client is still connected
+disconnect_poll: float = 1.0
+
+
+# ---------------------------------------------------------------------------- #
+#                               S C H E D U L E R                              #
+# ---------------------------------------------------------------------------- #
+
+
+class Ticket:
+    """One waiting request."""
+
+    def __init__(self, model: str, priority: int, session: str) -> None:
+        self.model = model
+        self.priority = priority
+        self.session = session
+        self.arrived = time.monotonic()
+        self.granted = False
+
+
+class Scheduler:
+    """
+    Decides which waiting request gets the next free upstream slot
+    (see the module docstring for the order).
+    """
+
+    def __init__(
+        self,
+        slots: int = default_slots,
+        affinity_limit: int = affinity_limit,
+        max_affinity_wait: float = max_affinity_wait,
+    ) -> None:
+        self.slots = slots
+        self.affinity_limit = affinity_limit
+        self.max_affinity_wait = max_affinity_wait
+        self.loaded: str | None = None
+        self.streak = 0
+        self.swaps = 0
+        self.active = 0
+        self.served = 0
+        self.abandoned = 0
+        self._waiting: list[Ticket] = []
+        self._last_served: dict[str, float] = {}
+        self._wait_avg: dict[str, float] = {}
+        self._condition = threading.Condition()
+
+    def acquire(
+        self,
+        model: str,
+        priority: str = "interactive",
+        session: str = "",
+        connected: Callable[[], bool] = lambda: True,
+    ) -> float | None:
+        """
+        Blocks until the request may go upstream.
+        Args:
+            connected (Callable[[], bool], optional): Checked every
+                `disconnect_poll` seconds while waiting; once it returns False
+                the request leaves the queue.
+        Returns:
+            float | None: Seconds spent waiting, or None if the client went
+            away (no slot is held then).
+        """
+        ticket = Ticket(model, PRIORITIES.get(priority, 0), session)
+        with self._condition:
+            self._waiting.append(ticket)
+            self._dispatch()
+            while not ticket.granted:
+                self._condition.wait(disconnect_poll)
+                if not ticket.granted and not connected():
+                    self._waiting.remove(ticket)
+                    self.abandoned += 1
+                    return None
+        waited = time.monotonic() - ticket.arrived
+        with self._condition:
+            # Moving average of the wait per priority class, for the stats
+            name = _priority_name(ticket.priority)
+            self._wait_avg[name] = 0.8 * self._wait_avg.get(name, waited) + 0.2 * waited
+        return waited
+
+    def release(self) -> None:
+        """Frees the slot of a finished (or failed) request."""
+        with self._condition:
+            self.active -= 1
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        granted = False
+        while self._waiting and self.active < self.slots:
+            ticket = self._pick()
+            self._waiting.remove(ticket)
+            ticket.granted = granted = True
+            self.active += 1
+            self.served += 1
+            self._last_served[ticket.session] = time.monotonic()
+            if ticket.model == self.loaded:
+                self.streak += 1
+            else:
+                self.swaps += self.loaded is not None
+                self.loaded, self.streak = ticket.model, 1
+        if granted:
+            self._condition.notify_all()
+
+    def _pick(self) -> Ticket:
+        now = time.monotonic()
+        top = min(ticket.priority for ticket in self._waiting)
+        pool = [ticket for ticket in self._waiting if ticket.priority == top]
+
+        same = [ticket for ticket in pool if ticket.model == self.loaded]
+        starved = any(
+            now - ticket.arrived > self.max_affinity_wait
+            for ticket in pool
+            if ticket.model != self.loaded
+        )
+        if same and not starved and self.streak < self.affinity_limit:
+            pool = same
+        else:
+            # Switching: go to the model whose oldest request has waited longest
+            others = [ticket for ticket in pool if ticket.model != self.loaded] or pool
+            oldest = min(others, key=lambda ticket: ticket.arrived)
+            pool = [ticket for ticket in pool if ticket.model == oldest.model]
+
+        return min(
+            pool,
+            key=lambda ticket: (self._last_served.get(ticket.session, 0.0), ticket.arrived),
+        )
+
+    def stats(self) -> dict:
+        """Queue depth per model and priority, waits, slot use and model swaps."""
+        now = time.monotonic()
+        with self._condition:
+            queues: dict[str, dict[str, int]] = {}
+            for ticket in self._waiting:
+                counts = queues.setdefault(ticket.model, {name: 0 for name in PRIORITIES})
+                counts[_priority_name(ticket.priority)] += 1
+            return {
+                "waiting": len(self._waiting),
+                "active": self.active,
+                "slots": self.slots,
+                "loaded_model": self.loaded,
+                "model_swaps": self.swaps,
+                "served": self.served,
+                "abandoned": self.abandoned,
+                "queues": queues,
+                "sessions_waiting": len({ticket.session for ticket in self._waiting}),
+                "longest_wait": max((now - t.arrived for t in self._waiting), default=0.0),
+                "average_wait": dict(self._wait_avg),
+            }
+
+
+def _priority_name(priority: int) -> str:
+    return next(name for name, value in PRIORITIES.items() if value == priority)
+
+
+# ---------------------------------------------------------------------------- #
+#                                   P R O X Y                                  #
+# ---------------------------------------------------------------------------- #
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """Forwards requests to the upstream Ollama, model requests through the scheduler."""
+
+    protocol_version = "HTTP/1.1"
+    scheduler: Scheduler
+    upstream: tuple[str, int]
+
+    def do_GET(self) -> None:
+        if self.path == "/scheduler/stats":
+            self._send_json(200, self.scheduler.stats())
+        else:
+            self._forward(b"")
+
+    def do_HEAD(self) -> None:
+        self._forward(b"")
+
+    def do_DELETE(self) -> None:
+        self._forward(self._body())
+
+    def do_POST(self) -> None:
+        body = self._body()
+        model = None
+        if urlsplit(self.path).path in SCHEDULED_PATHS:
+            try:
+                model = json.loads(body or b"{}").get("model")
+            except (ValueError, AttributeError):
+                model = None
+        if model is None:
+            self._forward(body)
+            return
+
+        waited = self.scheduler.acquire(
+            model,
+            self.headers.get("X-Priority", "interactive"),
+            self.headers.get("X-Session", self.client_address[0]),
+            self._connected,
+        )
+        if waited is None:
+            self.close_connection = True
+            return
+        try:
+            if not self._connected():
+                # Gone between its last check and getting the slot
+                self.close_connection = True
+                return
+            self._forward(body, {"X-Queue-Wait": f"{waited:.3f}"})
+        finally:
+            self.scheduler.release()
+
+    def _connected(self) -> bool:
+        """False once the client has closed its connection (the socket reads EOF)."""
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return not readable or self.connection.recv(1, socket.MSG_PEEK) != b""
+        except OSError:
+            return False
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _forward(self, body: bytes, extra_headers: dict | None = None) -> None:
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS}
+        if body:
+            headers["Content-Length"] = str(len(body))
+        connection = http.client.HTTPConnection(*self.upstream, timeout=upstream_timeout)
+        try:
+            connection.request(self.command, self.path, body or None, headers)
+            response = connection.getresponse()
+        except OSError as e:
+            connection.close()
+            self._send_json(502, {"error": f"upstream unavailable: {e}"})
+            return
+
+        try:
+            self.send_response(response.status, response.reason)
+            for key, value in response.getheaders():
+                if key.lower() not in HOP_HEADERS:
+                    self.send_header(key, value)
+            for key, value in (extra_headers or {}).items():
+                self.send_header(key, value)
+            length = response.getheader("Content-Length")
+            if self.command == "HEAD":
+                self.send_header("Content-Length", length or "0")
+                self.end_headers()
+                return
+            if length is not None:
+                self.send_header("Content-Length", length)
+                self.end_headers()
+                self.wfile.write(response.read())
+                return
+
+            # Streamed answers (NDJSON chunks) are passed on as they arrive
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            while chunk := response.read1(65536):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            connection.close()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------- #
+
+
+def make_server(
+    port: int, upstream: str, slots: int = default_slots, host: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """
+    Builds the proxy server (call `serve_forever` on it).
+    Args:
+        port (int): Port to listen on.
+        upstream (str): URL of the real Ollama server.
+        slots (int, optional): Requests allowed upstream at once.
+        host (str, optional): Interface to listen on.
+    Returns:
+        ThreadingHTTPServer: The proxy.
+    """
+    parts = urlsplit(upstream if "://" in upstream else f"http://{upstream}")
+    handler = type(
+        "Handler",
+        (ProxyHandler,),
+        {"scheduler": Scheduler(slots), "upstream": (parts.hostname, parts.port or 11434)},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Priority / model-affinity queue in front of Ollama")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--upstream", default="http://localhost:11434")
+    parser.add_argument("--slots", type=int, default=default_slots, help="Requests sent upstream at once")
+    args = parser.parse_args()
+    server = make_server(args.port, args.upstream, args.slots, args.host)
+    print(f"Scheduling {args.upstream} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
+
+# ------------------------------------ End ----------------------------------- #